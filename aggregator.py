@@ -0,0 +1,537 @@
+"""
+Streaming aggregation engine
+Folds parsed chunks into mergeable accumulators so memory is bounded by
+the cardinality of the counted values rather than the number of lines
+"""
+import heapq
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from compression import DECOMPRESSION_ERRORS, MemberReader, file_compression, find_member_offsets
+from config import ERROR_CODES, BURST_WINDOW, USE_MMAP
+from log_parser import EPOCH, LogParser, ip_keys, ip_text
+from metrics import METRICS, MetricPlan
+from sketches import HyperLogLog, KeyedHyperLogLog, SpaceSaving
+
+# Number of entries kept in top-N style metrics
+TOP_N = 10
+
+
+def top_items(counter: Counter, n: int = None) -> Dict:
+    """
+    Highest counts first, ties broken by key so the order does not
+    depend on how the data was chunked or merged
+    """
+    key = lambda item: (-item[1], str(item[0]))
+    if n is None:
+        return dict(sorted(counter.items(), key=key))
+    return dict(heapq.nsmallest(n, counter.items(), key=key))
+
+
+def top_ips(counter: Counter, n: int = TOP_N) -> Dict:
+    """
+    top_items for a counter keyed by ip_counts keys, in dotted form
+    Only the candidates that can make the top n are formatted
+    """
+    if not counter:
+        return {}
+    threshold = heapq.nlargest(n, counter.values())[-1]
+    return top_items({ip_text(ip): count for ip, count in counter.items() if count >= threshold}, n)
+
+
+def count_intervals(summary: SpaceSaving, top: Dict, ips: bool = False) -> Dict:
+    """
+    Guaranteed [low, high] count interval for each entry of a top_items
+    or top_ips (ips=True) result taken from a Space-Saving summary
+    """
+    keys = ip_keys(list(top)) if ips else list(top)
+    return {name: list(summary.bounds(key)) for name, key in zip(top, keys)}
+
+
+def select_metrics(metrics: Iterable[str] = None) -> Tuple[str, ...]:
+    """
+    Registered metric names to compute, in registration order
+    None selects every metric; status_counts is always included because
+    totals and error rates are derived from it
+    """
+    if metrics is None:
+        return tuple(METRICS)
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+    selected = set(metrics) | {'status_counts'}
+    return tuple(name for name in METRICS if name in selected)
+
+
+def projected_parser(metrics: Iterable[str] = None) -> LogParser:
+    """
+    LogParser that extracts only the columns the selected metrics read
+    """
+    if metrics is None:
+        return LogParser()
+    return LogParser(columns=MetricPlan(select_metrics(metrics)).columns)
+
+
+class StreamingAggregator:
+    """
+    Mergeable accumulators for all analyzer metrics
+    """
+
+    COUNTERS = tuple(METRICS)  # One accumulator per registered metric
+    IP_COUNTERS = ('request_ip_counts', 'error_ip_counts')  # Keyed by ip_counts keys
+    # Keyed by integers: hour of day, epoch second, epoch hour
+    INT_COUNTERS = ('hourly_errors', 'error_seconds', 'hourly_unique_clients',
+                    'hourly_unique_error_clients', 'hourly_unique_urls')
+    # Keyed by (epoch minute, value) pairs, for the rollup tables
+    MINUTE_COUNTERS = ('minute_status_counts', 'minute_method_counts')
+    # High-cardinality counters that become SpaceSaving summaries in
+    # approximate mode
+    APPROXIMATE_COUNTERS = ('request_ip_counts', 'error_ip_counts', 'error_url_counts')
+
+    def __init__(self, error_codes=ERROR_CODES, metrics: Iterable[str] = None,
+                 top_k_error: float = None):
+        self.error_codes = error_codes
+        # Only the selected metrics are computed; the other counters stay empty
+        self.metrics = select_metrics(metrics)
+        self.plan = MetricPlan(self.metrics, error_codes)
+        # None counts exactly; otherwise the fraction of the total by which
+        # an approximate count may exceed the true count
+        self.top_k_error = top_k_error
+        self.total_requests = 0
+        # Minutes before this are in the rollup tables but were dropped from
+        # the minute counters (see to_state); counts for them are additions
+        self.rollup_horizon = None
+        # status_counts, method_counts, ..., error_seconds (epoch second
+        # -> errors, for burst detection) and the HyperLogLog distinct
+        # counts; see metrics.py
+        for name in self.COUNTERS:
+            setattr(self, name, self._new_counter(name))
+
+    def _new_counter(self, name: str):
+        """
+        Empty accumulator for a metric: the one it registered, or a
+        SpaceSaving summary for the high-cardinality counters in
+        approximate mode
+        """
+        if self.top_k_error is not None and name in self.APPROXIMATE_COUNTERS:
+            return SpaceSaving.for_error(self.top_k_error)
+        return METRICS[name].accumulator()
+
+    def update(self, df: pd.DataFrame):
+        """
+        Fold one parsed chunk into the accumulators
+        """
+        if df.empty:
+            return
+
+        self.total_requests += len(df)
+        for name, counts in self.plan.run(df).items():
+            getattr(self, name).update(counts)
+
+    def merge(self, other: 'StreamingAggregator') -> 'StreamingAggregator':
+        """
+        Merge another aggregator (e.g. from a worker process) into this one
+        """
+        self.total_requests += other.total_requests
+        if self.rollup_horizon is None:
+            self.rollup_horizon = other.rollup_horizon
+        for name in self.COUNTERS:
+            getattr(self, name).update(getattr(other, name))
+        return self
+
+    def to_state(self, keep_minutes: int = None) -> Dict:
+        """
+        JSON-serializable snapshot of the accumulators
+        With keep_minutes, the per-minute rollup counters keep only their
+        newest keep_minutes minutes; older ones must already be saved to
+        the rollup tables
+        """
+        horizon = None
+        if keep_minutes is not None:
+            minutes = [minute for name in self.MINUTE_COUNTERS for minute, _ in getattr(self, name)]
+            horizon = max(minutes) - keep_minutes + 1 if minutes else None
+        state = {'total_requests': self.total_requests, 'metrics': list(self.metrics),
+                 'top_k_error': self.top_k_error,
+                 'rollup_horizon': max(filter(None, (horizon, self.rollup_horizon)), default=None)}
+        for name in self.COUNTERS:
+            counter = getattr(self, name)
+            if horizon is not None and name in self.MINUTE_COUNTERS:
+                counter = Counter({key: count for key, count in counter.items() if key[0] >= horizon})
+            key = self._state_key(name)
+            if not isinstance(counter, Counter):
+                state[name] = counter.to_state(key)
+            else:
+                state[name] = {key(k): count for k, count in counter.items()} if key else dict(counter)
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'StreamingAggregator':
+        """
+        Rebuild an aggregator from to_state output
+        """
+        aggregator = cls(metrics=state.get('metrics'), top_k_error=state.get('top_k_error'))
+        aggregator.total_requests = state.get('total_requests', 0)
+        aggregator.rollup_horizon = state.get('rollup_horizon')
+        for name in cls.COUNTERS:
+            if name not in state:
+                continue
+            keys = cls._state_keys(name)
+            counter = getattr(aggregator, name)
+            if not isinstance(counter, Counter):
+                setattr(aggregator, name, type(counter).from_state(state[name], keys))
+            else:
+                stored = state[name]
+                restored = keys(list(stored)) if keys else list(stored)
+                setattr(aggregator, name, Counter(dict(zip(restored, stored.values()))))
+        return aggregator
+
+    @classmethod
+    def _state_key(cls, name: str):
+        """
+        Function mapping a key of a counter to its JSON key in to_state,
+        or None when it is stored unchanged
+        """
+        if name in cls.IP_COUNTERS:
+            return ip_text
+        if name in cls.MINUTE_COUNTERS:
+            return lambda key: f"{key[0]} {key[1]}"
+        return None
+
+    @classmethod
+    def _state_keys(cls, name: str):
+        """
+        Function mapping a list of to_state keys of a counter back to its
+        keys, or None when they are stored unchanged
+        """
+        if name in cls.IP_COUNTERS:
+            return ip_keys
+        if name in cls.INT_COUNTERS:
+            # JSON turns the integer hour and second keys into strings
+            return lambda keys: [int(key) for key in keys]
+        if name in cls.MINUTE_COUNTERS:
+            return lambda keys: [(int(minute), value) for minute, value in
+                                 (key.split(' ', 1) for key in keys)]
+        return None
+
+    def minute_rollups(self) -> Tuple[List[Dict], List[Dict]]:
+        """
+        (minute, status, count) and (minute, method, count) rows for the
+        rollup tables; minutes are counted from the epoch
+        """
+        status_rows = [{'minute': minute, 'status': status, 'count': count}
+                       for (minute, status), count in sorted(self.minute_status_counts.items())]
+        method_rows = [{'minute': minute, 'method': method, 'count': count}
+                       for (minute, method), count in sorted(self.minute_method_counts.items())]
+        return status_rows, method_rows
+
+    def forget_rolled_up_minutes(self):
+        """
+        Drop minutes before rollup_horizon from the minute counters once
+        they were added to the rollup tables, so they are not added twice
+        """
+        if self.rollup_horizon is None:
+            return
+        for name in self.MINUTE_COUNTERS:
+            counter = getattr(self, name)
+            for key in [key for key in counter if key[0] < self.rollup_horizon]:
+                del counter[key]
+
+    def error_second_stream(self) -> List[Tuple[int, int]]:
+        """
+        (epoch second, error count) pairs in time order
+        """
+        return sorted(self.error_seconds.items())
+
+    @property
+    def total_errors(self) -> int:
+        return sum(count for status, count in self.status_counts.items()
+                   if status in self.error_codes)
+
+    def error_distribution(self) -> Dict:
+        """
+        Error statistics: totals, error rate, per-status frequency and top error ips
+        """
+        total_errors = self.total_errors
+        error_rate = (total_errors / self.total_requests * 100) if self.total_requests > 0 else 0
+        error_freq = Counter({status: count for status, count in self.status_counts.items()
+                              if status in self.error_codes})
+
+        return {
+            'total_requests': self.total_requests,
+            'total_errors': total_errors,
+            'error_rate': error_rate,
+            'error_frequency': top_items(error_freq),
+            'top_error_ips': top_ips(self.error_ip_counts)
+        }
+
+    def detailed_metrics(self, burst_streams: List[Iterable[Tuple[int, int]]] = None) -> Dict:
+        """
+        Method, hourly, top IP, error path and error burst metrics
+        burst_streams overrides the time-ordered error streams used for
+        burst detection (e.g. one stream per merged log file)
+        """
+        metrics = {
+            'method_distribution': top_items(self.method_counts),
+            'hourly_error_pattern': dict(sorted(self.hourly_errors.items())),
+            'top_request_ips': top_ips(self.request_ip_counts)
+        }
+        if self.error_url_counts:
+            metrics['error_paths'] = top_items(self.error_url_counts, TOP_N)
+        if self.error_seconds:
+            metrics['peak_error_burst'] = peak_error_burst(
+                burst_streams if burst_streams is not None else [self.error_second_stream()]
+            )
+        if self.top_k_error is not None:
+            metrics['count_intervals'] = self.count_intervals(metrics)
+        distinct = self.distinct_counts()
+        if distinct:
+            metrics['distinct_counts'] = distinct
+        return metrics
+
+    def distinct_counts(self) -> Dict:
+        """
+        HyperLogLog estimates of the selected distinct-count metrics, with
+        the per-hour estimates under 'hourly' keyed by 'YYYY-MM-DD HH:00'
+        """
+        distinct, hourly = {}, {}
+        for name in self.metrics:
+            counter = getattr(self, name)
+            if isinstance(counter, HyperLogLog):
+                distinct[name] = counter.count()
+            elif isinstance(counter, KeyedHyperLogLog):
+                for hour, count in counter.counts().items():
+                    hourly.setdefault(hour_text(hour), {})[name] = count
+        if hourly:
+            distinct['hourly'] = hourly
+        return distinct
+
+    def distinct_sketches(self) -> List[Tuple[str, Optional[int], HyperLogLog]]:
+        """
+        (metric, epoch hour or None, sketch) for every HyperLogLog, so the
+        registers can be stored and merged with other runs later
+        """
+        sketches = []
+        for name in self.metrics:
+            counter = getattr(self, name)
+            if isinstance(counter, HyperLogLog) and counter:
+                sketches.append((name, None, counter))
+            elif isinstance(counter, KeyedHyperLogLog):
+                sketches.extend((name, hour, sketch) for hour, sketch in sorted(counter.items()))
+        return sketches
+
+    def count_intervals(self, metrics: Dict) -> Dict:
+        """
+        Guaranteed [low, high] intervals for the approximate top IP and
+        error path counts, plus the largest possible error of each summary
+        """
+        intervals = {
+            'top_error_ips': count_intervals(self.error_ip_counts, top_ips(self.error_ip_counts), ips=True),
+            'top_request_ips': count_intervals(self.request_ip_counts, metrics['top_request_ips'], ips=True),
+            'error_paths': count_intervals(self.error_url_counts, metrics.get('error_paths', {}))
+        }
+        intervals['max_error'] = {
+            'top_error_ips': self.error_ip_counts.max_error,
+            'top_request_ips': self.request_ip_counts.max_error,
+            'error_paths': self.error_url_counts.max_error
+        }
+        return intervals
+
+
+def hour_text(hour: int) -> str:
+    """
+    Epoch hour as 'YYYY-MM-DD HH:00'
+    """
+    return (EPOCH + pd.Timedelta(hours=hour)).strftime('%Y-%m-%d %H:00')
+
+
+def peak_error_burst(streams: List[Iterable[Tuple[int, int]]], window: int = BURST_WINDOW) -> Dict:
+    """
+    Largest number of errors within any window of consecutive seconds
+    Each stream must be in time order; several streams (e.g. one per log
+    file) are combined with a k-way heap merge, so no global sort is needed
+    """
+    in_window = deque()
+    running, peak, peak_start = 0, 0, None
+
+    for second, count in heapq.merge(*streams):
+        in_window.append((second, count))
+        running += count
+        while in_window[0][0] <= second - window:
+            running -= in_window.popleft()[1]
+        if running > peak:
+            peak, peak_start = running, in_window[0][0]
+
+    return {
+        'window_seconds': window,
+        'errors': peak,
+        'start': (EPOCH + pd.Timedelta(seconds=peak_start)).strftime('%Y-%m-%d %H:%M:%S')
+                 if peak_start is not None else None
+    }
+
+
+def aggregate_chunks(chunks: Iterable[pd.DataFrame], metrics: Iterable[str] = None,
+                     top_k_error: float = None) -> StreamingAggregator:
+    """
+    Fold an iterable of parsed chunks into a new aggregator
+    """
+    aggregator = StreamingAggregator(metrics=metrics, top_k_error=top_k_error)
+    for chunk in chunks:
+        aggregator.update(chunk)
+    return aggregator
+
+
+def aggregate_file(filepath: str, chunk_size: int = 10000, metrics: Iterable[str] = None,
+                   top_k_error: float = None) -> StreamingAggregator:
+    """
+    Aggregate a whole log file (plain or compressed) serially
+    Also the process pool entry point for multi-file analysis
+    """
+    chunks = projected_parser(metrics).parse_file_chunks(filepath, chunk_size, use_mmap=USE_MMAP)
+    return aggregate_chunks(chunks, metrics, top_k_error)
+
+
+def aggregate_files_parallel(filepaths: List[str], chunk_size: int = 10000, workers: int = 2,
+                             metrics: Iterable[str] = None,
+                             top_k_error: float = None) -> Iterable[Tuple[str, StreamingAggregator]]:
+    """
+    Aggregate several log files concurrently, one file per task
+    Generator yields (filepath, aggregator) pairs in input order
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(aggregate_file, filepath, chunk_size, metrics, top_k_error)
+                   for filepath in filepaths]
+        for filepath, future in zip(filepaths, futures):
+            yield filepath, future.result()
+
+
+def aggregate_file_parallel(filepath: str, chunk_size: int = 10000, workers: int = 2,
+                            start: int = 0, end: int = None, metrics: Iterable[str] = None,
+                            top_k_error: float = None) -> Iterable[StreamingAggregator]:
+    """
+    Aggregate byte-range shards of [start, end) of a file on a process pool
+    Generator yields one partial aggregator per range, in file order
+    Compressed files are split at member boundaries instead of byte ranges
+    """
+    codec = file_compression(filepath)
+    if codec is not None:
+        yield from _aggregate_compressed_parallel(filepath, codec, chunk_size, workers, metrics, top_k_error)
+        return
+
+    ranges = LogParser().split_byte_ranges(filepath, workers * 4, start, end)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_aggregate_range, filepath, start, end, chunk_size, metrics, top_k_error)
+            for start, end in ranges
+        ]
+        for future in futures:
+            yield future.result()
+
+
+def _aggregate_range(filepath: str, start: int, end: int, chunk_size: int,
+                     metrics: Iterable[str] = None, top_k_error: float = None) -> StreamingAggregator:
+    """
+    Process pool entry point: aggregate one byte range
+    """
+    chunks = projected_parser(metrics).parse_byte_range(filepath, start, end, chunk_size)
+    return aggregate_chunks(chunks, metrics, top_k_error)
+
+
+def _aggregate_compressed_parallel(filepath: str, codec: str, chunk_size: int, workers: int,
+                                   metrics: Iterable[str] = None,
+                                   top_k_error: float = None) -> Iterable[StreamingAggregator]:
+    """
+    Decompress and aggregate groups of archive members on a process pool
+    Lines may straddle member boundaries, so each worker hands back the
+    partial first and last lines of its segment and they are stitched
+    together here in file order
+    """
+    parser = projected_parser(metrics)
+    offsets = find_member_offsets(filepath, codec)
+    if len(offsets) < 2:
+        # A single member can only be decompressed serially
+        yield aggregate_chunks(parser.parse_file_chunks(filepath, chunk_size, use_mmap=True),
+                               metrics, top_k_error)
+        return
+
+    num_segments = min(workers * 4, len(offsets))
+    bounds = sorted({0} | {offsets[len(offsets) * i // num_segments] for i in range(num_segments)})
+    segments = list(zip(bounds, bounds[1:] + [os.path.getsize(filepath)]))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_aggregate_members, filepath, codec, start, end,
+                        metrics=metrics, top_k_error=top_k_error)
+            for start, end in segments
+        ]
+
+        expected, carry = 0, b''
+        for (start, end), future in zip(segments, futures):
+            if expected >= end:
+                # The previous member ran past a false-positive boundary
+                # and already covered this whole segment
+                continue
+
+            segment = future.result()
+            if segment is None or segment['start'] != expected:
+                # Segment started on a false-positive signature: redo it
+                # from the real member boundary
+                segment = _aggregate_members(filepath, codec, expected, end, strict=True,
+                                             metrics=metrics, top_k_error=top_k_error)
+
+            if segment['head'] is None:
+                # No newline in the whole segment
+                carry += segment['tail']
+            else:
+                yield aggregate_chunks([parser.parse_bytes_block(carry + segment['head'])],
+                                       metrics, top_k_error)
+                yield segment['aggregator']
+                carry = segment['tail']
+            expected = segment['next_start']
+
+        if carry:
+            yield aggregate_chunks([parser.parse_bytes_block(carry)], metrics, top_k_error)
+
+
+def _aggregate_members(filepath: str, codec: str, start: int, end: int,
+                       strict: bool = False, metrics: Iterable[str] = None,
+                       top_k_error: float = None) -> Optional[Dict]:
+    """
+    Process pool entry point: decompress and aggregate the archive members
+    starting in [start, end)
+    Returns None when start is not a real member boundary (unless strict)
+    """
+    parser = projected_parser(metrics)
+    aggregator = StreamingAggregator(metrics=metrics, top_k_error=top_k_error)
+    reader = MemberReader(filepath, codec, start, end)
+    head, pending = None, b''
+
+    try:
+        for data in reader:
+            pending += data
+            newline = pending.rfind(b'\n')
+            if newline == -1:
+                continue
+
+            block, pending = pending[:newline + 1], pending[newline + 1:]
+            if head is None:
+                # The first line may continue the previous segment's last line
+                first = block.find(b'\n') + 1
+                head, block = block[:first], block[first:]
+            aggregator.update(parser.parse_bytes_block(block))
+    except DECOMPRESSION_ERRORS:
+        if strict:
+            raise
+        return None
+
+    return {
+        'start': start,
+        'next_start': reader.next_start,
+        'head': head,
+        'aggregator': aggregator,
+        'tail': pending
+    }
@@ -2,17 +2,28 @@
 Flask web dashboard for log analysis results
 Minimal but functional web interface
 """
-from flask import Flask, render_template, jsonify
-from database import db_manager
-from config import HOST, PORT, DEBUG
+from flask import Flask, Response, render_template, jsonify, request, make_response, url_for, abort
+from database import DatabaseManager, get_db_manager
+from chart_cache import ChartCache
+from change_feed import ChangeFeed
+from jobs import JobManager
+from config import HOST, PORT, DEBUG, FEED_HEARTBEAT, API_PAGE_SIZE, API_PAGE_MAX
 import matplotlib
 matplotlib.use('Agg')  # Required for headless environments
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import io
-import base64
 import json
+import queue
+from datetime import datetime
 
 app = Flask(__name__)
+# Create the database and its tables, then only read, over read-only connections
+get_db_manager()
+db_manager = DatabaseManager(read_only=True)
+# One poller shared by every live dashboard
+change_feed = ChangeFeed(db_manager)
+# Analyses submitted through the API run in worker processes
+job_manager = JobManager()
 
 @app.route('/')
 def dashboard():
@@ -23,8 +34,12 @@ def dashboard():
     # Get overall statistics
     stats = db_manager.get_statistics()
     
-    # Generate trend chart
-    trend_chart = generate_trend_chart(recent_analyses)
+    # Start rendering the trend chart now if these analyses changed it;
+    # the page itself only links to it
+    trend_chart = None
+    if recent_analyses:
+        trend_chart_cache.refresh(trend_chart_key(recent_analyses), recent_analyses)
+        trend_chart = url_for('trend_chart')
     
     return render_template('dashboard.html',
                          recent_analyses=recent_analyses,
@@ -37,39 +52,167 @@ def get_analyses():
     analyses = db_manager.get_recent_analyses(limit=20)
     return jsonify(analyses)
 
+@app.route('/api/history')
+def get_history():
+    """
+    API endpoint for paginated analysis history, newest first
+    (?limit=&cursor= from the previous page's next_cursor, &fields=id,error_rate,
+    &since=&until= ISO dates)
+    """
+    since = request.args.get('since')
+    until = request.args.get('until')
+    fields = request.args.get('fields')
+    try:
+        limit = min(max(int(request.args.get('limit', API_PAGE_SIZE)), 1), API_PAGE_MAX)
+        page = db_manager.get_analyses_page(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            fields=fields.split(',') if fields else None,
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Submit an analysis job (JSON: log path or glob inside the log directory,
+    optional since/until ISO dates and metrics); returns 202 with the job
+    """
+    try:
+        job = job_manager.submit(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job), 202, {'Location': url_for('get_job', job_id=job['id'])}
+
+@app.route('/api/jobs')
+def list_jobs():
+    """API endpoint for the status of recent jobs"""
+    return jsonify(job_manager.list())
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """API endpoint for a job's status, progress and result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
 @app.route('/api/stats')
 def get_stats():
     """API endpoint for statistics"""
     stats = db_manager.get_statistics()
     return jsonify(stats)
 
-def generate_trend_chart(analyses):
-    """Generate a simple trend chart as base64 image"""
-    if not analyses:
-        return None
+@app.route('/api/events')
+def events():
+    """
+    Server-Sent Events stream: an 'analysis' event with the analysis and
+    updated statistics whenever a new analysis is saved
+    """
+    subscriber = change_feed.subscribe()
+    
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=FEED_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            change_feed.unsubscribe(subscriber)
     
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/distinct')
+def get_distinct():
+    """API endpoint for distinct counts merged across saved analyses (?since=&until= ISO dates)"""
+    since = request.args.get('since')
+    until = request.args.get('until')
+    try:
+        counts = db_manager.get_distinct_counts(
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(counts)
+
+@app.route('/api/timeseries')
+def get_timeseries():
+    """API endpoint for per-minute requests and error rates (?since=&until= ISO dates, &source=)"""
+    since = request.args.get('since')
+    until = request.args.get('until')
+    try:
+        series = db_manager.get_status_series(
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None,
+            source=request.args.get('source')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(series)
+
+@app.route('/chart/trend.png')
+def trend_chart():
+    """
+    Error rate trend chart as PNG, rendered once per set of recent analyses
+    Browsers revalidate it with If-None-Match and get 304 while unchanged
+    A ?v=<analysis id> request (a live update) waits for the new chart
+    instead of getting the previous one while it renders
+    """
+    recent_analyses = db_manager.get_recent_analyses(limit=5)
+    if not recent_analyses:
+        abort(404)
+    etag, png = trend_chart_cache.lookup(trend_chart_key(recent_analyses), recent_analyses,
+                                         stale='v' not in request.args)
+    
+    response = make_response(png)
+    response.mimetype = 'image/png'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Cache, but revalidate on every use
+    return response.make_conditional(request)
+
+def trend_chart_key(analyses):
+    """Cache key of the trend chart: the ids of the analyses it plots"""
+    return tuple(a['id'] for a in analyses)
+
+def generate_trend_chart(analyses):
+    """Generate a simple trend chart as PNG bytes"""
     # Extract data for chart
     timestamps = [a['timestamp'][:16] for a in analyses]  # Shorten timestamp
     error_rates = [a['error_rate'] for a in analyses]
     
-    # Create figure
-    plt.figure(figsize=(10, 4))
-    plt.plot(timestamps, error_rates, marker='o', linewidth=2)
-    plt.fill_between(timestamps, error_rates, alpha=0.3)
-    plt.title('Error Rate Trend (Recent Analyses)')
-    plt.xlabel('Timestamp')
-    plt.ylabel('Error Rate (%)')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    # Create figure; no pyplot state, so rendering is safe off the request thread
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    ax.plot(timestamps, error_rates, marker='o', linewidth=2)
+    ax.fill_between(timestamps, error_rates, alpha=0.3)
+    ax.set_title('Error Rate Trend (Recent Analyses)')
+    ax.set_xlabel('Timestamp')
+    ax.set_ylabel('Error Rate (%)')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
     
-    # Convert to base64 for HTML
     buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return f"data:image/png;base64,{image_base64}"
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+trend_chart_cache = ChartCache(generate_trend_chart)
 
 @app.route('/health')
 def health_check():
@@ -0,0 +1,652 @@
+"""
+Performance benchmarks for the log analyzer
+Run: python benchmark.py [benchmark ...] [--log FILE]
+"""
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import tempfile
+import time
+
+from config import INPUT_LOG, CHUNK_SIZE
+
+
+def _count_lines(filepath: str) -> int:
+    """Count raw lines in a file"""
+    with open(filepath, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def _best_of(func, repeat: int = 3) -> float:
+    """Run func several times and return the fastest wall time"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_parser(log_file: str):
+    """Line-by-line parsing vs vectorized block parsing (lines/sec)"""
+    from log_parser import LogParser
+
+    parser = LogParser()
+    total_lines = _count_lines(log_file)
+
+    for label, vectorized in (('line-by-line', False), ('vectorized', True)):
+        elapsed = _best_of(lambda: sum(
+            len(chunk) for chunk in
+            parser.parse_file_chunks(log_file, CHUNK_SIZE, vectorized=vectorized)
+        ))
+        print(f"  {label:<14} {elapsed:8.3f}s  {total_lines / elapsed:>12,.0f} lines/sec")
+
+
+def bench_reader(log_file: str):
+    """Decoded text reader vs mmap bytes reader (lines/sec)"""
+    from log_parser import LogParser
+
+    parser = LogParser()
+    total_lines = _count_lines(log_file)
+
+    for label, use_mmap in (('text', False), ('mmap bytes', True)):
+        elapsed = _best_of(lambda: sum(
+            len(chunk) for chunk in
+            parser.parse_file_chunks(log_file, CHUNK_SIZE, use_mmap=use_mmap)
+        ))
+        print(f"  {label:<14} {elapsed:8.3f}s  {total_lines / elapsed:>12,.0f} lines/sec")
+
+
+def bench_parallel(log_file: str):
+    """Serial aggregation vs byte-range sharded aggregation on a process pool"""
+    from aggregator import aggregate_chunks, aggregate_file_parallel
+    from log_parser import LogParser
+
+    parser = LogParser()
+    total_lines = _count_lines(log_file)
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        if workers == 1:
+            run = lambda: aggregate_chunks(parser.parse_file_chunks(log_file, CHUNK_SIZE))
+        else:
+            run = lambda: list(aggregate_file_parallel(log_file, CHUNK_SIZE, workers))
+        elapsed = _best_of(run)
+        print(f"  {workers:>2} worker(s)   {elapsed:8.3f}s  {total_lines / elapsed:>12,.0f} lines/sec")
+
+
+def bench_compression(log_file: str):
+    """Parse throughput per codec, single-member vs multi-member archives"""
+    from aggregator import aggregate_chunks, aggregate_file_parallel
+    from log_parser import LogParser
+
+    parser = LogParser()
+    total_lines = _count_lines(log_file)
+    with open(log_file, 'rb') as f:
+        data = f.read()
+
+    # Multi-member archives are built from 16 independently compressed parts
+    step = len(data) // 16 + 1
+    parts = [data[i:i + step] for i in range(0, len(data), step)]
+    codecs = {
+        'gzip': gzip.compress,
+        'bz2': bz2.compress,
+        'xz': lambda part: lzma.compress(part, preset=1),
+    }
+    workers = max(2, os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec, compress in codecs.items():
+            for layout, payload in (('single', compress(data)),
+                                    ('multi', b''.join(compress(p) for p in parts))):
+                path = os.path.join(tmp, f"server.log.{codec}.{layout}")
+                with open(path, 'wb') as f:
+                    f.write(payload)
+
+                runs = [('serial', lambda: aggregate_chunks(
+                    parser.parse_file_chunks(path, CHUNK_SIZE, use_mmap=True)))]
+                if layout == 'multi':
+                    runs.append((f'{workers} workers', lambda: list(
+                        aggregate_file_parallel(path, CHUNK_SIZE, workers))))
+
+                for label, run in runs:
+                    elapsed = _best_of(run)
+                    print(f"  {codec:<5} {layout:<7} {label:<11} {elapsed:8.3f}s"
+                          f"  {total_lines / elapsed:>12,.0f} lines/sec"
+                          f"  {len(data) / elapsed / 1e6:8.1f} MB/s uncompressed")
+
+
+def bench_memory(log_file: str):
+    """Chunk memory per row: all-object string columns vs typed columns"""
+    import pandas as pd
+    from log_parser import LogParser
+
+    parser = LogParser()
+    with open(log_file, encoding='utf-8') as f:
+        text = ''.join(line for _, line in zip(range(CHUNK_SIZE), f))
+
+    rows = parser.block_pattern.findall(text)
+    layouts = {
+        'object': pd.DataFrame(rows, columns=parser.fields + ['unmatched']).drop(columns='unmatched'),
+        'typed': parser.parse_block(text),
+    }
+    baseline = None
+    for label, chunk in layouts.items():
+        usage = chunk.memory_usage(deep=True, index=False)
+        per_row = usage.sum() / len(chunk)
+        baseline = baseline or per_row
+        columns = '  '.join(f"{name}={usage[name] / len(chunk):.1f}" for name in chunk.columns)
+        print(f"  {label:<7} {per_row:8.1f} bytes/row  ({baseline / per_row:4.1f}x)  {columns}")
+
+
+def bench_timestamps(log_file: str):
+    """Timestamp conversion: pd.to_datetime (inferred / explicit format) vs epoch_seconds"""
+    import pandas as pd
+    from config import TIMESTAMP_FORMAT
+    from log_parser import epoch_seconds
+
+    with open(log_file, encoding='utf-8') as f:
+        stamps = [line[:19] for line in f]
+    index = pd.Index(stamps, dtype=object)
+
+    runs = {
+        'inferred': lambda: pd.to_datetime(index, errors='coerce'),
+        'format': lambda: pd.to_datetime(index, format=TIMESTAMP_FORMAT, errors='coerce'),
+        'epoch_seconds': lambda: epoch_seconds(stamps),
+    }
+    for label, run in runs.items():
+        elapsed = _best_of(run)
+        print(f"  {label:<14} {elapsed:8.3f}s  {len(stamps) / elapsed:>12,.0f} values/sec")
+
+
+def bench_projection(log_file: str):
+    """Parse + aggregate with all columns vs only the columns the metrics need"""
+    from aggregator import aggregate_chunks, projected_parser
+
+    total_lines = _count_lines(log_file)
+    selections = {
+        'all metrics': None,
+        'status only': ['status_counts'],
+        'ip only': ['request_ip_counts'],
+    }
+    baseline = None
+    for label, metrics in selections.items():
+        parser = projected_parser(metrics)
+        elapsed = _best_of(lambda: aggregate_chunks(
+            parser.parse_file_chunks(log_file, CHUNK_SIZE), metrics
+        ))
+        baseline = baseline or elapsed
+        print(f"  {label:<14} {elapsed:8.3f}s  {total_lines / elapsed:>12,.0f} lines/sec"
+              f"  ({baseline / elapsed:4.1f}x)  columns={','.join(parser.fields)}")
+
+
+def bench_topk(log_file: str):
+    """Exact IP / error path counters vs Space-Saving summaries"""
+    from aggregator import aggregate_chunks
+    from log_parser import LogParser
+
+    chunks = list(LogParser().parse_file_chunks(log_file, CHUNK_SIZE))
+    counters = ('request_ip_counts', 'error_ip_counts', 'error_url_counts')
+    baseline = None
+    for label, top_k_error in (('exact', None), ('error 1e-3', 0.001), ('error 1e-4', 0.0001)):
+        elapsed = _best_of(lambda: aggregate_chunks(chunks, top_k_error=top_k_error))
+        aggregator = aggregate_chunks(chunks, top_k_error=top_k_error)
+        entries = sum(len(getattr(aggregator, name)) for name in counters)
+        max_error = max(getattr(getattr(aggregator, name), 'max_error', 0) for name in counters)
+        baseline = baseline or elapsed
+        print(f"  {label:<11} {elapsed:8.3f}s  ({baseline / elapsed:4.1f}x)"
+              f"  {entries:>10,} entries  max error {max_error:,}")
+
+
+def _fill_rollups(manager, start_minute: int, days: int) -> int:
+    """Save one day of synthetic minute rollups per call, as daily analyses would"""
+    import random
+
+    statuses = ['200', '201', '301', '304', '400', '404', '500', '503']
+    methods = ['GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS', 'PATCH']
+    random.seed(0)
+    rows = 0
+    for day in range(days):
+        minutes = range(start_minute + day * 1440, start_minute + (day + 1) * 1440)
+        status_rows = [{'minute': minute, 'status': status, 'count': random.randint(1, 500)}
+                       for minute in minutes for status in statuses]
+        method_rows = [{'minute': minute, 'method': method, 'count': random.randint(1, 500)}
+                       for minute in minutes for method in methods]
+        manager.save_rollups('bench.log', status_rows, method_rows)
+        rows += len(status_rows) + len(method_rows)
+    return rows
+
+
+def bench_rollups(log_file: str):
+    """Minute rollup ingest and range-query latency for 30 days of data"""
+    from datetime import timedelta
+    from database import DatabaseManager, minute_datetime
+
+    start_minute, days = 29_000_000, 30
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'rollups.db')}")
+        start = time.perf_counter()
+        rows = _fill_rollups(manager, start_minute, days)
+        elapsed = time.perf_counter() - start
+        print(f"  ingest       {elapsed:8.3f}s  {rows / elapsed:>12,.0f} rows/sec  ({rows:,} rows)")
+
+        until = minute_datetime(start_minute + days * 1440)
+        for label, span in (('last hour', timedelta(hours=1)), ('last day', timedelta(days=1)),
+                            ('last 7 days', timedelta(days=7)), ('last 30 days', timedelta(days=30))):
+            latency = _best_of(lambda: manager.get_status_series(until - span, until))
+            print(f"  {label:<12} {latency * 1000:8.1f}ms  "
+                  f"{len(manager.get_status_series(until - span, until)):>8,} minutes")
+        manager.engine.dispose()
+
+
+def bench_compaction(log_file: str):
+    """Tiered rollup compaction of 30 days of minute data, 23 of them past 7 days"""
+    from database import DatabaseManager, minute_datetime
+
+    start_minute, days = 29_000_000, 30
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'rollups.db')}")
+        rows = _fill_rollups(manager, start_minute, days)
+        now = minute_datetime(start_minute + days * 1440)
+        span = manager.get_status_series()
+        report = manager.clear_old_data(days_to_keep=days, now=now)
+        print(f"  compacted {report['rows_compacted']:,} of {rows:,} rows into {report['rows_written']:,} "
+              f"in {report['seconds']:.3f}s")
+        print(f"  {report['transactions']} transactions, longest "
+              f"{report['longest_transaction_seconds'] * 1000:.1f}ms")
+        print(f"  30-day series: {len(span):,} points before, {len(manager.get_status_series()):,} after")
+
+        # Re-analyzing the same days must not add minutes next to compacted buckets
+        compacted = sum(point['requests'] for point in manager.get_status_series())
+        _fill_rollups(manager, start_minute, days)
+        reanalyzed = sum(point['requests'] for point in manager.get_status_series())
+        print(f"  re-analysis after compaction: {compacted:,} requests before, {reanalyzed:,} after")
+        if reanalyzed != compacted:
+            raise RuntimeError("re-analysis after compaction double counted requests")
+        manager.engine.dispose()
+
+
+def _fill_analyses(manager, runs: int):
+    """Save runs synthetic analyses with seven error statuses and ten top IPs each"""
+    import random
+
+    random.seed(0)
+    statuses = ['400', '401', '403', '404', '500', '502', '503']
+    for _ in range(runs):
+        errors = {status: random.randint(1, 1000) for status in statuses}
+        requests = sum(errors.values()) * random.randint(2, 20)
+        manager.save_analysis({
+            'total_requests': requests,
+            'total_errors': sum(errors.values()),
+            'error_rate': sum(errors.values()) / requests * 100,
+            'error_frequency': errors,
+            'top_error_ips': {f"10.0.{random.randint(0, 255)}.{random.randint(0, 255)}": random.randint(1, 100)
+                              for _ in range(10)},
+        })
+
+
+def bench_history(log_file: str, runs: int = 5000):
+    """Per-status history and top-IP lookups: JSON column scan vs indexed child tables"""
+    from database import AnalysisResult, DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+        _fill_analyses(manager, runs)
+
+        def scan_history():
+            session = manager.Session()
+            rows = session.query(AnalysisResult).order_by(AnalysisResult.timestamp.desc()).all()
+            session.close()
+            return [row.to_dict()['error_distribution'].get('503', 0) for row in rows[:500]][::-1]
+
+        def scan_ip():
+            session = manager.Session()
+            rows = session.query(AnalysisResult).order_by(AnalysisResult.timestamp.desc()).all()
+            session.close()
+            return [row.id for row in rows if '10.0.1.1' in row.to_dict()['top_error_ips']]
+
+        lookups = (
+            ('503 history, JSON scan', scan_history),
+            ('503 history, SQL', lambda: manager.get_status_history('503', limit=500)),
+            ('IP lookup, JSON scan', scan_ip),
+            ('IP lookup, SQL', lambda: manager.get_runs_with_top_ip('10.0.1.1')),
+        )
+        for label, run in lookups:
+            latency = _best_of(run)
+            print(f"  {label:<24} {latency * 1000:8.1f}ms  {len(run()):>6,} rows  ({runs:,} analyses)")
+        manager.engine.dispose()
+
+
+def bench_statistics(log_file: str):
+    """get_statistics: full-table aggregates vs the maintained summary row"""
+    from sqlalchemy import func
+    from database import AnalysisResult, DatabaseManager
+
+    def aggregate(manager):
+        session = manager.Session()
+        total_runs = session.query(AnalysisResult).count()
+        avg_error_rate = session.query(func.avg(AnalysisResult.error_rate)).scalar()
+        last_run = session.query(AnalysisResult).order_by(AnalysisResult.timestamp.desc()).first()
+        session.close()
+        return total_runs, avg_error_rate, last_run.to_dict()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'statistics.db')}")
+        stored = 0
+        for runs in (1000, 10000):
+            _fill_analyses(manager, runs - stored)
+            stored = runs
+            for label, run in (('aggregates', lambda: aggregate(manager)),
+                               ('summary row', manager.get_statistics)):
+                latency = _best_of(run, repeat=20)
+                print(f"  {runs:>7,} runs  {label:<12} {latency * 1000:8.2f}ms")
+        manager.engine.dispose()
+
+
+def bench_dashboard(log_file: str, views: int = 50):
+    """Dashboard page views: rendering the trend chart per view vs the cached chart with ETags"""
+    import app
+
+    client = app.app.test_client()
+    recent_analyses = app.db_manager.get_recent_analyses(limit=5)
+    if not recent_analyses:
+        print("  no saved analyses; run log_analyzer.py first")
+        return
+
+    def rendered():
+        client.get('/')
+        app.generate_trend_chart(recent_analyses)
+
+    etag = client.get('/chart/trend.png').headers['ETag']
+
+    def revalidated():
+        client.get('/')
+        client.get('/chart/trend.png', headers={'If-None-Match': etag})
+
+    for label, view in (('render per view', rendered), ('cached + 304', revalidated)):
+        elapsed = _best_of(lambda: [view() for _ in range(views)])
+        print(f"  {label:<16} {elapsed / views * 1000:8.2f}ms/view  {views / elapsed:>8,.0f} views/sec")
+
+
+def bench_feed(log_file: str, duration: float = 2.0, interval: float = 0.1):
+    """Database statements per second for N live dashboards: per-client polling vs one shared change feed"""
+    import threading
+    from sqlalchemy import event
+    from change_feed import ChangeFeed
+    from database import DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'feed.db')}"
+        writer = DatabaseManager(url)
+        reader = DatabaseManager(url, read_only=True)
+        statements = [0]
+        event.listen(reader.engine, 'before_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+        # Each returns the threads to run and a count of updates delivered
+        def polling(clients, stop):
+            def client():
+                while not stop.wait(interval):
+                    reader.get_statistics()
+                    reader.get_recent_analyses(limit=5)
+            return [threading.Thread(target=client) for _ in range(clients)], None
+
+        def shared_feed(clients, stop):
+            feed = ChangeFeed(reader, poll_interval=interval)
+            queues = [feed.subscribe() for _ in range(clients)]
+            stop_feed = threading.Thread(target=lambda: (stop.wait(), feed.stop()))
+            return [stop_feed], lambda: sum(q.qsize() for q in queues)
+
+        for clients in (1, 10, 100):
+            for label, start in (('polling', polling), ('shared feed', shared_feed)):
+                stop = threading.Event()
+                threads, delivered = start(clients, stop)
+                statements[0] = 0
+                for thread in threads:
+                    thread.start()
+                saves = 0
+                started = time.perf_counter()
+                while time.perf_counter() - started < duration:
+                    writer.save_analysis({'total_requests': 100, 'total_errors': 5, 'error_rate': 5.0})
+                    saves += 1
+                    time.sleep(0.25)
+                stop.set()
+                for thread in threads:
+                    thread.join()
+                events = f"  {delivered():,} events delivered" if delivered else ""
+                print(f"  {clients:>4} clients  {label:<12} {statements[0] / duration:>8,.0f} statements/sec"
+                      f"  ({saves} saves){events}")
+        reader.engine.dispose()
+        writer.engine.dispose()
+
+
+def bench_pagination(log_file: str, rows: int = 1_000_000, page_size: int = 20):
+    """History page latency by depth: OFFSET with full rows vs keyset cursors with a field projection"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from database import AnalysisResult, DatabaseManager, encode_cursor
+
+    start = datetime(2020, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+        session = manager.Session()
+        errors = '{"500": 10, "503": 5}'
+        ips = '{"10.0.0.1": 7, "10.0.0.2": 3}'
+        for batch in range(0, rows, 50_000):
+            session.execute(insert(AnalysisResult), [
+                {'timestamp': start + timedelta(minutes=i), 'total_requests': 1000, 'total_errors': 15,
+                 'error_rate': 1.5, 'error_distribution': errors, 'top_error_ips': ips, 'execution_time': 0.1}
+                for i in range(batch, min(batch + 50_000, rows))
+            ])
+        session.commit()
+
+        def offset_page(depth):
+            query_session = manager.Session()
+            page = query_session.query(AnalysisResult)\
+                .order_by(AnalysisResult.timestamp.desc())\
+                .offset(depth).limit(page_size).all()
+            query_session.close()
+            return [row.to_dict() for row in page]
+
+        for depth in (0, 10_000, 500_000, rows - page_size):
+            cursor = None
+            if depth:
+                previous = session.query(AnalysisResult.timestamp, AnalysisResult.id)\
+                    .order_by(AnalysisResult.timestamp.desc(), AnalysisResult.id.desc())\
+                    .offset(depth - 1).first()
+                cursor = encode_cursor(*previous)
+            keyset = lambda: manager.get_analyses_page(page_size, cursor, fields=['id', 'timestamp', 'error_rate'])
+            print(f"  depth {depth:>9,}  offset {_best_of(lambda: offset_page(depth)) * 1000:8.2f}ms"
+                  f"  keyset {_best_of(keyset) * 1000:8.2f}ms")
+        session.close()
+        manager.engine.dispose()
+
+
+def bench_concurrency(log_file: str, duration: float = 3.0, readers: int = 4):
+    """Dashboard read latency while rollups are written, rollback journal vs WAL pragmas"""
+    import threading
+    from database import DatabaseManager, minute_datetime
+    from config import SQLITE_PRAGMAS
+
+    start_minute, days = 29_000_000, 7
+    configs = (('rollback journal', {'journal_mode': 'DELETE'}), ('WAL + tuned', SQLITE_PRAGMAS))
+    for label, pragmas in configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'concurrency.db')}"
+            writer = DatabaseManager(url, pragmas=pragmas)
+            _fill_rollups(writer, start_minute, days)
+            reader = DatabaseManager(url, read_only=True, pragmas=pragmas)
+            until = minute_datetime(start_minute + days * 1440)
+            since = minute_datetime(start_minute + days * 1440 - 60)
+            stop = threading.Event()
+            latencies, errors, writes = [], [], [0]
+
+            def write():
+                # A day of rows per transaction, rewriting the range the readers query
+                minutes = range(start_minute + (days - 1) * 1440, start_minute + days * 1440)
+                while not stop.is_set():
+                    rows = [{'minute': minute, 'status': status, 'count': writes[0] % 500 + 1}
+                            for minute in minutes for status in ('200', '404', '500')]
+                    writer.save_rollups('writer.log', rows)
+                    writes[0] += len(rows)
+
+            def read():
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    try:
+                        reader.get_status_series(since, until)
+                    except Exception:
+                        errors.append(1)
+                        continue
+                    latencies.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=write)] + \
+                [threading.Thread(target=read) for _ in range(readers)]
+            for thread in threads:
+                thread.start()
+            time.sleep(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+            print(f"  {label:<17} p50 {p50 * 1000:7.2f}ms  p99 {p99 * 1000:7.2f}ms  "
+                  f"{len(latencies) / duration:>8,.0f} reads/sec  {len(errors)} errors  "
+                  f"{writes[0] / duration:>8,.0f} rows written/sec")
+            reader.engine.dispose()
+            writer.engine.dispose()
+
+
+def bench_incremental(log_file: str, lines: int = 20_000, appended: int = 100):
+    """Incremental run after an append with one late line: latency and rollup total vs analysis total"""
+    import subprocess
+    import sys
+    from database import DatabaseManager
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with open(log_file, encoding='utf-8') as f:
+        log_lines = [line for _, line in zip(range(lines + appended), f)]
+    with tempfile.TemporaryDirectory() as tmp:
+        # Runs write their database and logs into the scratch directory
+        tmp = os.path.realpath(tmp)
+        path = os.path.join(tmp, 'logs', 'server.log')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(log_lines[:lines])
+
+        def run():
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(repo, 'log_analyzer.py'), '--incremental',
+                            '--summary-only'], cwd=tmp, env=dict(os.environ, PYTHONPATH=repo),
+                           check=True, capture_output=True)
+            return time.perf_counter() - start
+
+        print(f"  first run, {lines:,} lines          {run():6.2f}s")
+        with open(path, 'a', encoding='utf-8') as f:
+            # The first line again: a timestamp far behind the checkpointed minutes
+            f.writelines([log_lines[0]] + log_lines[lines:])
+        print(f"  after +1 late, +{appended} lines        {run():6.2f}s")
+
+        manager = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'log_analysis.db')}")
+        analyzed = manager.get_recent_analyses(limit=1)[0]['total_requests']
+        rolled_up = sum(point['requests'] for point in manager.get_status_series(source=path))
+        manager.engine.dispose()
+        print(f"  analysis total {analyzed:,}  rollup total {rolled_up:,}")
+        if rolled_up != analyzed:
+            raise RuntimeError("rollups lost minutes after a late-line append")
+
+
+def bench_imports(log_file: str, repeat: int = 3):
+    """CLI startup: import time, --help, and --summary-only vs a full run with reports"""
+    import shutil
+    import subprocess
+    import sys
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    script = os.path.join(repo, 'log_analyzer.py')
+    heavy = ('pandas', 'sqlalchemy', 'matplotlib', 'seaborn', 'tqdm')
+    probe = (f"import sys; import log_analyzer; "
+             f"print(','.join(m for m in {heavy!r} if m in sys.modules) or 'none')")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Runs write their database, logs and reports into the scratch directory
+        os.makedirs(os.path.join(tmp, 'logs'))
+        shutil.copy(log_file, os.path.join(tmp, 'logs', 'server.log'))
+        env = dict(os.environ, PYTHONPATH=repo, MPLBACKEND='Agg')
+
+        def run(*args):
+            return subprocess.run([sys.executable, *args], cwd=tmp, env=env, check=True,
+                                  capture_output=True, text=True).stdout
+
+        loaded = run('-c', probe).strip()
+        print(f"  import log_analyzer  {_best_of(lambda: run('-c', 'import log_analyzer'), repeat):6.2f}s"
+              f"  heavy modules loaded: {loaded}")
+        print(f"  --help               {_best_of(lambda: run(script, '--help'), repeat):6.2f}s")
+        print(f"  --summary-only       {_best_of(lambda: run(script, '--summary-only'), repeat):6.2f}s")
+        print(f"  full run + reports   {_best_of(lambda: run(script), repeat):6.2f}s")
+
+
+def bench_reports(log_file: str):
+    """Chart rendering at CHART_DPI: one synchronous figure vs the render pool, cold and unchanged"""
+    from aggregator import aggregate_chunks
+    from config import CHART_DPI
+    from log_parser import LogParser
+    from report_generator import DASHBOARD, ReportGenerator, render_chart
+
+    aggregator = aggregate_chunks(LogParser().parse_file_chunks(log_file, CHUNK_SIZE))
+    results = dict(aggregator.error_distribution(), detailed_metrics=aggregator.detailed_metrics())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = ReportGenerator.chart_inputs(results)
+        start = time.perf_counter()
+        render_chart(DASHBOARD, inputs[DASHBOARD], os.path.join(tmp, 'dashboard.png'), '', dpi=CHART_DPI)
+        print(f"  synchronous dashboard, {CHART_DPI} dpi  {time.perf_counter() - start:6.2f}s blocked")
+
+        reporter = ReportGenerator(os.path.join(tmp, 'reports'), dpi=CHART_DPI)
+        for label in ('render pool, cold', 'render pool, unchanged'):
+            start = time.perf_counter()
+            reporter.generate_visualizations(results, wait=False)
+            queued = time.perf_counter() - start
+            reporter.wait()
+            print(f"  {label:<30}  {queued:6.2f}s blocked  {time.perf_counter() - start:6.2f}s until written")
+        reporter.close()
+
+
+BENCHMARKS = {
+    'parser': bench_parser,
+    'reader': bench_reader,
+    'parallel': bench_parallel,
+    'compression': bench_compression,
+    'memory': bench_memory,
+    'timestamps': bench_timestamps,
+    'projection': bench_projection,
+    'topk': bench_topk,
+    'rollups': bench_rollups,
+    'compaction': bench_compaction,
+    'concurrency': bench_concurrency,
+    'history': bench_history,
+    'statistics': bench_statistics,
+    'dashboard': bench_dashboard,
+    'feed': bench_feed,
+    'pagination': bench_pagination,
+    'incremental': bench_incremental,
+    'imports': bench_imports,
+    'reports': bench_reports,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Log analyzer benchmarks")
+    arg_parser.add_argument('benchmarks', nargs='*', choices=[[]] + list(BENCHMARKS),
+                            help="Benchmarks to run (default: all)")
+    arg_parser.add_argument('--log', default=INPUT_LOG, help="Log file to benchmark against")
+    args = arg_parser.parse_args()
+
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"[{name}] {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name](args.log)
+
+
+if __name__ == "__main__":
+    main()
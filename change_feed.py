@@ -0,0 +1,111 @@
+"""
+Shared change feed for live dashboard updates
+One background thread watches the analysis summary row and fans new
+analyses out to every subscriber's queue, so the database is read once per
+poll however many dashboards are connected
+"""
+import json
+import queue
+import threading
+from typing import Dict, List, Optional
+
+from config import FEED_POLL_INTERVAL, FEED_QUEUE_SIZE
+
+
+class ChangeFeed:
+    """
+    Publishes an 'analysis' event for each newly saved analysis, carrying
+    the analysis and the updated statistics
+    Polling runs only while someone is subscribed
+    """
+
+    def __init__(self, db_manager, poll_interval: float = FEED_POLL_INTERVAL,
+                 queue_size: int = FEED_QUEUE_SIZE):
+        self.db_manager = db_manager
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.last_run_id = None
+        self.thread = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def subscribe(self) -> queue.Queue:
+        """Queue that receives (event, data) tuples; pass it to unsubscribe when done"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self.subscribers.add(subscriber)
+            if self.thread is None or not self.thread.is_alive():
+                self.last_run_id = self._statistics().get('last_run_id')
+                self.thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def poll(self) -> List[Dict]:
+        """
+        Check for analyses saved since the last poll and publish them
+        Returns the published events
+        """
+        stats = self._statistics()
+        if stats.get('last_run_id') == self.last_run_id:
+            return []
+
+        analyses = self.db_manager.get_recent_analyses(limit=self.queue_size)
+        if self.last_run_id is not None:
+            analyses = [analysis for analysis in analyses if analysis['id'] > self.last_run_id]
+        self.last_run_id = stats.get('last_run_id')
+
+        rolling = {name: value for name, value in stats.items() if name not in ('last_run', 'last_run_id')}
+        events = [{'analysis': analysis, 'stats': rolling} for analysis in reversed(analyses)]
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for event in events:
+            self.publish('analysis', event, subscribers)
+        return events
+
+    def publish(self, event: str, data: Dict, subscribers: Optional[List[queue.Queue]] = None):
+        """Put one event on every subscriber's queue, dropping the oldest for slow readers"""
+        message = (event, json.dumps(data, default=str))
+        if subscribers is None:
+            with self._lock:
+                subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def stop(self):
+        """Stop polling once the current poll finishes"""
+        with self._lock:
+            self.subscribers.clear()
+        self._wake.set()
+
+    def _statistics(self) -> Dict:
+        stats = self.db_manager.get_statistics()
+        if stats.get('last_run'):
+            stats['last_run_id'] = stats['last_run']['id']
+        return stats
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                # A failed poll (e.g. the database is briefly locked) is retried next interval
+                continue
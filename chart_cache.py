@@ -0,0 +1,74 @@
+"""
+Cache of rendered dashboard charts
+Charts are rendered once per key (e.g. the ids of the analyses they plot)
+on a single background thread and kept in a small LRU, so page views only
+pay for rendering when the underlying data changed
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable, Optional, Tuple
+
+from config import CHART_CACHE_SIZE
+
+
+class ChartCache:
+    """
+    LRU of (etag, png) entries produced by render(*args)
+    While a new key renders, lookups can keep serving the last chart
+    """
+
+    def __init__(self, render: Callable[..., bytes], max_entries: int = CHART_CACHE_SIZE):
+        self.render = render
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (etag, png), least recently used first
+        self.pending = {}  # key -> Future of a render in progress
+        self.latest = None  # Key of the most recently rendered entry
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chart-render')
+        self._lock = threading.Lock()
+
+    def refresh(self, key: Hashable, *args) -> Optional[Future]:
+        """
+        Start rendering key in the background unless it is cached or
+        already rendering; returns the render's Future, if any
+        """
+        with self._lock:
+            return self._future(key, args)
+
+    def lookup(self, key: Hashable, *args, stale: bool = True) -> Tuple[str, bytes]:
+        """
+        (etag, png) for key. A missing key is rendered in the background;
+        meanwhile the last rendered chart is returned if stale is allowed,
+        otherwise (or when there is none) the caller waits for the render
+        """
+        with self._lock:
+            future = self._future(key, args)
+            if future is None:
+                return self.entries[key]
+            if stale and self.latest in self.entries:
+                return self.entries[self.latest]
+        return future.result()
+
+    def _future(self, key: Hashable, args: tuple) -> Optional[Future]:
+        # Called with the lock held
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return None
+        if key not in self.pending:
+            self.pending[key] = self.executor.submit(self._render, key, *args)
+        return self.pending[key]
+
+    def _render(self, key: Hashable, *args) -> Tuple[str, bytes]:
+        try:
+            png = self.render(*args)
+            entry = (hashlib.sha1(png).hexdigest(), png)
+            with self._lock:
+                self.entries[key] = entry
+                self.latest = key
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return entry
+        finally:
+            with self._lock:
+                self.pending.pop(key, None)
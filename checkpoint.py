@@ -0,0 +1,67 @@
+"""
+File identity and offset helpers for incremental analysis
+A checkpoint is only resumed when the log file is still the same file
+"""
+import hashlib
+import os
+from typing import Dict
+
+from config import CHECKPOINT_HEAD_BYTES
+
+
+def head_hash(filepath: str, length: int) -> str:
+    """
+    SHA-1 of the first length bytes of a file
+    """
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def file_identity(filepath: str) -> Dict:
+    """
+    Identify a log file by inode, device, size and a hash of its head
+    """
+    stat = os.stat(filepath)
+    head_length = min(stat.st_size, CHECKPOINT_HEAD_BYTES)
+    return {
+        'inode': stat.st_ino,
+        'device': stat.st_dev,
+        'size': stat.st_size,
+        'head_hash': head_hash(filepath, head_length),
+        'head_length': head_length
+    }
+
+
+def is_same_file(checkpoint: Dict, identity: Dict, filepath: str) -> bool:
+    """
+    Check whether a checkpoint still applies to the file
+    Returns False when the file was rotated (new inode or different head)
+    or truncated (now shorter than the checkpoint offset)
+    """
+    if (checkpoint['inode'], checkpoint['device']) != (identity['inode'], identity['device']):
+        return False
+
+    if identity['size'] < checkpoint['offset']:
+        return False
+
+    # Compare the head hash over the length recorded at checkpoint time
+    return head_hash(filepath, checkpoint['head_length']) == checkpoint['head_hash']
+
+
+def complete_lines_end(filepath: str, size: int) -> int:
+    """
+    Offset just past the last newline before size
+    A trailing partial line may still be being written, so it is left
+    for the next run
+    """
+    block = 64 * 1024
+    with open(filepath, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
@@ -0,0 +1,165 @@
+"""
+Transparent decompression for rotated log files
+The codec is chosen by magic bytes, never by file extension. Archives made
+of several gzip members, bz2 streams or xz streams can be split at member
+boundaries so each part is decompressed on a separate worker process
+"""
+import bz2
+import gzip
+import lzma
+import mmap
+import re
+import zlib
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+
+from config import READ_BLOCK_SIZE
+
+MAGIC = {
+    'gzip': b'\x1f\x8b',
+    'bz2': b'BZh',
+    'xz': b'\xfd7zXZ\x00',
+}
+
+OPENERS = {
+    'gzip': lambda f: gzip.GzipFile(fileobj=f, mode='rb'),
+    'bz2': lambda f: bz2.BZ2File(f, mode='rb'),
+    'xz': lambda f: lzma.LZMAFile(f, mode='rb'),
+}
+
+DECOMPRESSORS = {
+    'gzip': lambda: zlib.decompressobj(wbits=31),
+    'bz2': bz2.BZ2Decompressor,
+    'xz': lambda: lzma.LZMADecompressor(format=lzma.FORMAT_XZ),
+}
+
+# Byte-aligned signatures at the start of a gzip member, bz2 stream or
+# xz stream. They can also occur by chance inside compressed data, so
+# matches are only candidates until a decompressor accepts them.
+MEMBER_SIGNATURES = {
+    'gzip': re.compile(rb'\x1f\x8b\x08[\x00-\x1f]'),
+    'bz2': re.compile(rb'BZh[1-9]1AY&SY'),
+    'xz': re.compile(rb'\xfd7zXZ\x00'),
+}
+
+DECOMPRESSION_ERRORS = (OSError, EOFError, ValueError, zlib.error, lzma.LZMAError)
+
+
+def detect_compression(f) -> Optional[str]:
+    """
+    Codec name from the first bytes of a buffered binary file, or None
+    for plain text. Uses peek so nothing is consumed, which keeps pipes usable
+    """
+    head = f.peek(len(max(MAGIC.values(), key=len)))
+    for codec, magic in MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def file_compression(filepath: str) -> Optional[str]:
+    """
+    Codec name of a file on disk, or None for plain text
+    """
+    with open(filepath, 'rb') as f:
+        return detect_compression(f)
+
+
+@contextmanager
+def open_log(filepath: str):
+    """
+    Open a log file for binary reading, decompressing on the fly if the
+    magic bytes identify gzip, bz2 or xz
+    """
+    with open(filepath, 'rb') as raw:
+        codec = detect_compression(raw)
+        if codec is None:
+            yield raw
+        else:
+            with OPENERS[codec](raw) as stream:
+                yield stream
+
+
+def find_member_offsets(filepath: str, codec: str) -> List[int]:
+    """
+    Candidate offsets where a gzip member, bz2 stream or xz stream starts
+    """
+    with open(filepath, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return [0]
+        with mapped:
+            return [match.start() for match in MEMBER_SIGNATURES[codec].finditer(mapped)]
+
+
+class MemberReader:
+    """
+    Decompress consecutive members of an archive, starting at the member
+    that begins at start and stopping before the first member that begins
+    at or after end. Iterating yields decompressed bytes; afterwards
+    next_start is the offset of the first member that was not read
+    """
+
+    def __init__(self, filepath: str, codec: str, start: int, end: int):
+        self.filepath = filepath
+        self.codec = codec
+        self.start = start
+        self.end = end
+        self.next_start = None
+
+    def __iter__(self) -> Iterable[bytes]:
+        with open(self.filepath, 'rb') as f:
+            f.seek(self.start)
+            offset = self.start  # Compressed offset of data[0]
+            data = b''
+
+            while True:
+                # NUL padding between members is allowed and skipped
+                stripped = data.lstrip(b'\0')
+                offset += len(data) - len(stripped)
+                data = stripped
+                if not data:
+                    data = f.read(READ_BLOCK_SIZE)
+                    if not data:
+                        break
+                    continue
+
+                if offset >= self.end:
+                    break
+
+                decompressor = DECOMPRESSORS[self.codec]()
+                while True:
+                    output = decompressor.decompress(data)
+                    if output:
+                        yield output
+                    if decompressor.eof:
+                        unused = decompressor.unused_data
+                        offset += len(data) - len(unused)
+                        data = unused
+                        break
+
+                    offset += len(data)
+                    data = f.read(READ_BLOCK_SIZE)
+                    if not data:
+                        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+        self.next_start = offset
+
+
+def newline_blocks(chunks: Iterable[bytes]) -> Iterable[bytes]:
+    """
+    Regroup a stream of byte chunks into newline-aligned blocks
+    """
+    carry = b''
+    for data in chunks:
+        data = carry + data
+        newline = data.rfind(b'\n')
+        if newline == -1:
+            carry = data
+            continue
+        carry = data[newline + 1:]
+        yield data[:newline + 1]
+
+    if carry:
+        yield carry
@@ -14,24 +14,78 @@ OUTPUT_REPORT = "log_analysis_report.txt"
 DATABASE_PATH = "log_analysis.db"
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
+# SQLite tuning, applied to every connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers never wait for the writer
+    'synchronous': 'NORMAL',  # Safe with WAL; fsync only at checkpoints
+    'cache_size': -65536,  # Page cache per connection; negative means KiB (64 MB)
+    'mmap_size': 268435456,  # Bytes of the database file read through mmap
+    'busy_timeout': 5000,  # Milliseconds to wait for a lock before failing
+}
+DB_POOL_SIZE = 5  # Pooled connections per engine; further requests wait
+DB_POOL_TIMEOUT = 30  # Seconds to wait for a pooled connection
+
 # Web Dashboard
 HOST = "127.0.0.1"
 PORT = 5000
 DEBUG = True
+CHART_CACHE_SIZE = 16  # Rendered dashboard charts kept in memory (least recently used evicted)
+FEED_POLL_INTERVAL = 2.0  # Seconds between checks for new analyses, shared by all live dashboards
+FEED_HEARTBEAT = 15  # Seconds between keep-alive comments on idle event streams
+FEED_QUEUE_SIZE = 16  # Events buffered per dashboard; the oldest are dropped for slow clients
+API_PAGE_SIZE = 20  # Default analyses per /api/history page
+API_PAGE_MAX = 500  # Largest page a client may request
+JOB_WORKERS = 2  # Worker processes for analysis jobs submitted through /api/jobs
+JOB_HISTORY = 100  # Finished jobs remembered for status queries
 
 # Log patterns
 LOG_PATTERN = r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) (?P<ip>\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}) (?P<method>GET|POST|PUT|DELETE|HEAD|OPTIONS|PATCH) (?P<url>\S+) (?P<status>\d{3})'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'  # Layout of the timestamp group in LOG_PATTERN
+
+# HTTP methods accepted by LOG_PATTERN, in categorical code order
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS', 'PATCH')
+OTHER_METHOD = 'OTHER'  # Category counting requests whose method is not in HTTP_METHODS
 
 # Error status codes
 ERROR_CODES = {'400', '401', '403', '404', '405', '408', '429', '500', '502', '503', '504'}
 
 # Analysis parameters
 TOP_IPS_COUNT = 5
+BURST_WINDOW = 60  # Seconds in the sliding window for peak error bursts
 CHUNK_SIZE = 10000
+PARSE_WORKERS = 1  # Processes for parsing; >1 shards the log file by byte range
+USE_MMAP = False  # Read the log through mmap as bytes instead of decoded text lines
+READ_BLOCK_SIZE = 1024 * 1024  # Bytes per block for the mmap reader
+
+# Incremental analysis
+INCREMENTAL = False  # Resume from the last checkpoint and parse only the appended tail
+CHECKPOINT_HEAD_BYTES = 4096  # Bytes hashed to detect rotation of the log file
+CHECKPOINT_MINUTES = 5  # Newest minutes of rollup counts kept in a checkpoint for late lines
+CHECKPOINT_COMPRESSION = 1  # zlib level of checkpoint state (1 is fastest, most of the gain)
+
+# Approximate top-K
+APPROXIMATE_TOP_K = False  # Count IPs and error paths with bounded-memory Space-Saving summaries
+TOP_K_ERROR = 0.0001  # Largest overcount in approximate mode, as a fraction of the counted total
+
+# Distinct counts
+HLL_PRECISION = 14  # log2 of HyperLogLog registers; ~0.8% standard error, 16 KB per sketch
+HLL_HOURLY_PRECISION = 10  # Registers for the per-hour sketches; ~3.3% standard error, 1 KB each
+
+# Retention
+ROLLUP_TIERS = ((7, 60), (90, 1440))  # (age in days, minutes per bucket) rollups are compacted to
+COMPACTION_BATCH_MINUTES = 1440  # Minutes of rollups rewritten per compaction transaction
+DELETE_BATCH_ROWS = 500  # Old analyses deleted per transaction
+ROLLUP_DELETE_RUNS = 200  # Runs of consecutive minutes replaced per rollup DELETE statement
+
+# Follow mode
+FOLLOW_POLL_INTERVAL = 1.0  # Seconds to sleep when the followed log is idle
+SNAPSHOT_INTERVAL = 60  # Seconds between database snapshots while following
 
 # Visualization
 CHART_WIDTH = 12
 CHART_HEIGHT = 8
+CHART_DPI = 300  # Resolution of saved report charts
+REPORT_WORKERS = 4  # Processes rendering report charts in parallel
 COLOR_MAP = 'viridis'"""
 Configuration settings for Log File Analyzer
 """
@@ -48,22 +102,76 @@ OUTPUT_REPORT = "log_analysis_report.txt"
 DATABASE_PATH = "log_analysis.db"
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
+# SQLite tuning, applied to every connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers never wait for the writer
+    'synchronous': 'NORMAL',  # Safe with WAL; fsync only at checkpoints
+    'cache_size': -65536,  # Page cache per connection; negative means KiB (64 MB)
+    'mmap_size': 268435456,  # Bytes of the database file read through mmap
+    'busy_timeout': 5000,  # Milliseconds to wait for a lock before failing
+}
+DB_POOL_SIZE = 5  # Pooled connections per engine; further requests wait
+DB_POOL_TIMEOUT = 30  # Seconds to wait for a pooled connection
+
 # Web Dashboard
 HOST = "127.0.0.1"
 PORT = 5000
 DEBUG = True
+CHART_CACHE_SIZE = 16  # Rendered dashboard charts kept in memory (least recently used evicted)
+FEED_POLL_INTERVAL = 2.0  # Seconds between checks for new analyses, shared by all live dashboards
+FEED_HEARTBEAT = 15  # Seconds between keep-alive comments on idle event streams
+FEED_QUEUE_SIZE = 16  # Events buffered per dashboard; the oldest are dropped for slow clients
+API_PAGE_SIZE = 20  # Default analyses per /api/history page
+API_PAGE_MAX = 500  # Largest page a client may request
+JOB_WORKERS = 2  # Worker processes for analysis jobs submitted through /api/jobs
+JOB_HISTORY = 100  # Finished jobs remembered for status queries
 
 # Log patterns
 LOG_PATTERN = r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) (?P<ip>\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}) (?P<method>GET|POST|PUT|DELETE|HEAD|OPTIONS|PATCH) (?P<url>\S+) (?P<status>\d{3})'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'  # Layout of the timestamp group in LOG_PATTERN
+
+# HTTP methods accepted by LOG_PATTERN, in categorical code order
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS', 'PATCH')
+OTHER_METHOD = 'OTHER'  # Category counting requests whose method is not in HTTP_METHODS
 
 # Error status codes
 ERROR_CODES = {'400', '401', '403', '404', '405', '408', '429', '500', '502', '503', '504'}
 
 # Analysis parameters
 TOP_IPS_COUNT = 5
+BURST_WINDOW = 60  # Seconds in the sliding window for peak error bursts
 CHUNK_SIZE = 10000
+PARSE_WORKERS = 1  # Processes for parsing; >1 shards the log file by byte range
+USE_MMAP = False  # Read the log through mmap as bytes instead of decoded text lines
+READ_BLOCK_SIZE = 1024 * 1024  # Bytes per block for the mmap reader
+
+# Incremental analysis
+INCREMENTAL = False  # Resume from the last checkpoint and parse only the appended tail
+CHECKPOINT_HEAD_BYTES = 4096  # Bytes hashed to detect rotation of the log file
+CHECKPOINT_MINUTES = 5  # Newest minutes of rollup counts kept in a checkpoint for late lines
+CHECKPOINT_COMPRESSION = 1  # zlib level of checkpoint state (1 is fastest, most of the gain)
+
+# Approximate top-K
+APPROXIMATE_TOP_K = False  # Count IPs and error paths with bounded-memory Space-Saving summaries
+TOP_K_ERROR = 0.0001  # Largest overcount in approximate mode, as a fraction of the counted total
+
+# Distinct counts
+HLL_PRECISION = 14  # log2 of HyperLogLog registers; ~0.8% standard error, 16 KB per sketch
+HLL_HOURLY_PRECISION = 10  # Registers for the per-hour sketches; ~3.3% standard error, 1 KB each
+
+# Retention
+ROLLUP_TIERS = ((7, 60), (90, 1440))  # (age in days, minutes per bucket) rollups are compacted to
+COMPACTION_BATCH_MINUTES = 1440  # Minutes of rollups rewritten per compaction transaction
+DELETE_BATCH_ROWS = 500  # Old analyses deleted per transaction
+ROLLUP_DELETE_RUNS = 200  # Runs of consecutive minutes replaced per rollup DELETE statement
+
+# Follow mode
+FOLLOW_POLL_INTERVAL = 1.0  # Seconds to sleep when the followed log is idle
+SNAPSHOT_INTERVAL = 60  # Seconds between database snapshots while following
 
 # Visualization
 CHART_WIDTH = 12
 CHART_HEIGHT = 8
+CHART_DPI = 300  # Resolution of saved report charts
+REPORT_WORKERS = 4  # Processes rendering report charts in parallel
 COLOR_MAP = 'viridis'
\ No newline at end of file
@@ -2,15 +2,25 @@
 Database operations for historical analysis
 Uses SQLAlchemy ORM for simplicity
 """
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, func
+from sqlalchemy import (Column, Integer, BigInteger, String, Text, DateTime, Float,
+                        LargeBinary, ForeignKey, Index, case, func, insert, inspect, or_, text, tuple_)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from collections import Counter
 from datetime import datetime, timedelta
-from config import DATABASE_URL
+from config import (DATABASE_URL, ERROR_CODES, ROLLUP_TIERS, COMPACTION_BATCH_MINUTES, DELETE_BATCH_ROWS,
+                    ROLLUP_DELETE_RUNS, CHECKPOINT_COMPRESSION)
+from sketches import HyperLogLog
+from storage import WriterThread, create_sqlite_engine, serialized_write
+import base64
+import bisect
 import json
+import threading
+import time
+import zlib
 
 Base = declarative_base()
-engine = create_engine(DATABASE_URL)
+engine = create_sqlite_engine(DATABASE_URL)
 Session = sessionmaker(bind=engine)
 
 class AnalysisResult(Base):
@@ -21,7 +31,7 @@ class AnalysisResult(Base):
     timestamp = Column(DateTime, default=datetime.now, index=True)
     total_requests = Column(Integer)
     total_errors = Column(Integer)
-    error_rate = Column(Float)
+    error_rate = Column(Float, index=True)
     error_distribution = Column(String)  # JSON string
     top_error_ips = Column(String)       # JSON string
     execution_time = Column(Float)
@@ -39,23 +49,250 @@ class AnalysisResult(Base):
             'execution_time': self.execution_time
         }
 
+# Fields of AnalysisResult.to_dict, in order; the JSON ones are decoded on read
+ANALYSIS_FIELDS = ('id', 'timestamp', 'total_requests', 'total_errors', 'error_rate',
+                   'error_distribution', 'top_error_ips', 'execution_time')
+JSON_FIELDS = ('error_distribution', 'top_error_ips')
+
+def encode_cursor(timestamp, analysis_id):
+    """Opaque page cursor for the position just after (timestamp, id)"""
+    position = json.dumps([timestamp.isoformat(), analysis_id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(timestamp, id) of a cursor from encode_cursor; ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, analysis_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), int(analysis_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+class AnalysisSummary(Base):
+    """
+    Model for the running totals behind get_statistics (a single row)
+    Kept current in the same transaction as every save and delete
+    """
+    __tablename__ = 'analysis_summary'
+    
+    id = Column(Integer, primary_key=True)
+    total_runs = Column(Integer, default=0)
+    error_rate_sum = Column(Float, default=0.0)
+    total_requests_sum = Column(BigInteger, default=0)
+    total_errors_sum = Column(BigInteger, default=0)
+    min_error_rate = Column(Float)
+    max_error_rate = Column(Float)
+    last_run_id = Column(Integer)
+    last_run_timestamp = Column(DateTime)
+    
+    def to_dict(self):
+        """Convert to dictionary for easy serialization"""
+        return {
+            'total_runs': self.total_runs,
+            'error_rate_sum': self.error_rate_sum,
+            'total_requests_sum': self.total_requests_sum,
+            'total_errors_sum': self.total_errors_sum,
+            'min_error_rate': self.min_error_rate,
+            'max_error_rate': self.max_error_rate,
+            'last_run_id': self.last_run_id,
+            'last_run_timestamp': self.last_run_timestamp.isoformat() if self.last_run_timestamp else None
+        }
+
+class ErrorCount(Base):
+    """Model for the error status counts of an analysis (one row per status)"""
+    __tablename__ = 'analysis_error_counts'
+    
+    id = Column(Integer, primary_key=True)
+    analysis_id = Column(Integer, ForeignKey('analysis_results.id'), index=True)
+    status = Column(String)
+    count = Column(Integer)
+    
+    __table_args__ = (
+        # Covers per-status history queries
+        Index('ix_analysis_error_counts_status', 'status', 'analysis_id', 'count'),
+    )
+
+class TopErrorIP(Base):
+    """Model for the top error IPs of an analysis (one row per IP)"""
+    __tablename__ = 'analysis_top_ips'
+    
+    id = Column(Integer, primary_key=True)
+    analysis_id = Column(Integer, ForeignKey('analysis_results.id'), index=True)
+    ip = Column(String)
+    count = Column(Integer)
+    
+    __table_args__ = (
+        Index('ix_analysis_top_ips_ip', 'ip', 'analysis_id', 'count'),
+    )
+
+class DistinctSketch(Base):
+    """Model for HyperLogLog registers saved with an analysis (one row per metric and hour)"""
+    __tablename__ = 'distinct_sketches'
+    
+    id = Column(Integer, primary_key=True)
+    analysis_id = Column(Integer, ForeignKey('analysis_results.id'), index=True)
+    metric = Column(String, index=True)
+    hour = Column(BigInteger, index=True)  # Epoch hour; None for whole-run sketches
+    precision = Column(Integer)
+    registers = Column(LargeBinary)        # zlib-compressed registers
+    
+    def to_sketch(self):
+        """Rebuild the HyperLogLog"""
+        return HyperLogLog.from_bytes(self.registers, self.precision)
+
+class StatusRollup(Base):
+    """Model for per-minute request counts by status (one row per source, bucket and status)"""
+    __tablename__ = 'status_rollups'
+    
+    id = Column(Integer, primary_key=True)
+    source = Column(String)             # Log file the counts came from
+    minute = Column(BigInteger)         # Start of the bucket, in minutes since the epoch
+    status = Column(String)
+    count = Column(Integer)
+    resolution = Column(Integer, default=1)  # Minutes per bucket; raised by compaction
+    
+    __table_args__ = (
+        Index('ix_status_rollups_source_minute', 'source', 'minute'),
+        # Covers minute-range queries, so they never read the table itself
+        Index('ix_status_rollups_minute', 'minute', 'status', 'count'),
+        Index('ix_status_rollups_resolution_minute', 'resolution', 'minute'),
+    )
+
+class MethodRollup(Base):
+    """Model for per-minute request counts by method (one row per source, minute and method)"""
+    __tablename__ = 'method_rollups'
+    
+    id = Column(Integer, primary_key=True)
+    source = Column(String)
+    minute = Column(BigInteger)
+    method = Column(String)
+    count = Column(Integer)
+    resolution = Column(Integer, default=1)
+    
+    __table_args__ = (
+        Index('ix_method_rollups_source_minute', 'source', 'minute'),
+        Index('ix_method_rollups_minute', 'minute', 'method', 'count'),
+        Index('ix_method_rollups_resolution_minute', 'resolution', 'minute'),
+    )
+
+def epoch_minute(moment):
+    """Minutes since the epoch of a naive datetime (log timestamps carry no zone)"""
+    return (moment - datetime(1970, 1, 1)) // timedelta(minutes=1)
+
+def minute_datetime(minute):
+    """Inverse of epoch_minute"""
+    return datetime(1970, 1, 1) + timedelta(minutes=minute)
+
+def minute_runs(minutes):
+    """(first, last) ranges of consecutive minutes covering exactly the given minutes"""
+    runs = []
+    for minute in sorted(set(minutes)):
+        if runs and minute == runs[-1][1] + 1:
+            runs[-1][1] = minute
+        else:
+            runs.append([minute, minute])
+    return [tuple(run) for run in runs]
+
+class Checkpoint(Base):
+    """Model for incremental analysis checkpoints (one row per log file)"""
+    __tablename__ = 'checkpoints'
+    
+    id = Column(Integer, primary_key=True)
+    log_file = Column(String, unique=True, index=True)
+    inode = Column(BigInteger)
+    device = Column(BigInteger)
+    head_hash = Column(String)
+    head_length = Column(Integer)
+    offset = Column(BigInteger)         # End of the last fully processed line
+    state = Column(Text)                # JSON running aggregates (checkpoints saved before state_zlib)
+    state_zlib = Column(LargeBinary)    # zlib-compressed JSON running aggregates
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def to_dict(self):
+        """Convert to dictionary for easy serialization"""
+        return {
+            'log_file': self.log_file,
+            'inode': self.inode,
+            'device': self.device,
+            'head_hash': self.head_hash,
+            'head_length': self.head_length,
+            'offset': self.offset,
+            'state': json.loads(zlib.decompress(self.state_zlib)) if self.state_zlib is not None
+                     else json.loads(self.state) if self.state else {},
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class DatabaseManager:
-    """Simple database operations manager"""
+    """
+    Simple database operations manager
+    Writes run one at a time on the manager's writer thread; reads use
+    pooled connections from the calling thread. A read_only manager (for
+    the dashboard) opens the database read-only and cannot write
+    """
     
-    def __init__(self):
-        self.engine = engine
-        self.create_tables()
+    def __init__(self, database_url=None, read_only=False, pragmas=None):
+        # A separate database (e.g. for benchmarks) gets its own engine
+        self.read_only = read_only
+        if database_url is None and not read_only and pragmas is None:
+            self.engine, self.Session = engine, Session
+        else:
+            self.engine = create_sqlite_engine(database_url or DATABASE_URL, read_only, pragmas)
+            self.Session = sessionmaker(bind=self.engine)
+        self.writer = WriterThread()
+        if not read_only:
+            self.create_tables()
     
     def create_tables(self):
-        """Create database tables if they don't exist"""
+        """
+        Create database tables if they don't exist, and add the columns
+        and indexes that were introduced after an existing table was created
+        """
+        existing_tables = set(inspect(self.engine).get_table_names())
         Base.metadata.create_all(self.engine)
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} " \
+                          f"{column.type.compile(self.engine.dialect)}"
+                    if column.default is not None and not callable(column.default.arg):
+                        ddl += f" DEFAULT {column.default.arg!r}"
+                    connection.execute(text(ddl))
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+            
+            # Child rows of analyses saved before the child tables existed
+            if AnalysisResult.__tablename__ in existing_tables:
+                for model in (ErrorCount, TopErrorIP):
+                    if model.__tablename__ not in existing_tables:
+                        self._backfill_children(connection, model)
+        
+        if AnalysisSummary.__tablename__ not in existing_tables:
+            self.rebuild_summary()
+    
+    @staticmethod
+    def _backfill_children(connection, model):
+        """Fill a child table from the JSON columns of every stored analysis"""
+        column = 'error_distribution' if model is ErrorCount else 'top_error_ips'
+        key = 'status' if model is ErrorCount else 'ip'
+        rows = connection.execute(text(f"SELECT id, {column} FROM {AnalysisResult.__tablename__}"))
+        children = [{'analysis_id': analysis_id, key: value, 'count': count}
+                    for analysis_id, data in rows if data
+                    for value, count in json.loads(data).items()]
+        if children:
+            connection.execute(insert(model), children)
     
-    def save_analysis(self, results):
+    @serialized_write
+    def save_analysis(self, results, sketches=None):
         """
-        Save analysis results to database
+        Save analysis results to database, with the (metric, hour, sketch)
+        HyperLogLog registers of StreamingAggregator.distinct_sketches
         Returns the saved record ID
         """
-        session = Session()
+        session = self.Session()
         
         # Prepare data
         error_dist = json.dumps(results.get('error_frequency', {}))
@@ -73,15 +310,228 @@ class DatabaseManager:
         
         # Save to database
         session.add(record)
+        session.flush()
+        self._save_children(session, record.id, results)
+        self._add_to_summary(session, record)
+        for metric, hour, sketch in sketches or []:
+            session.add(DistinctSketch(analysis_id=record.id, metric=metric, hour=hour,
+                                       precision=sketch.precision, registers=sketch.to_bytes()))
         session.commit()
         record_id = record.id
         session.close()
         
         return record_id
     
+    @staticmethod
+    def _add_to_summary(session, record):
+        """Fold a new analysis into the summary row, in the caller's transaction"""
+        summary = AnalysisSummary
+        rate = record.error_rate or 0.0
+        session.query(summary).filter(summary.id == 1).update({
+            summary.total_runs: summary.total_runs + 1,
+            summary.error_rate_sum: summary.error_rate_sum + rate,
+            summary.total_requests_sum: summary.total_requests_sum + (record.total_requests or 0),
+            summary.total_errors_sum: summary.total_errors_sum + (record.total_errors or 0),
+            # CASE rather than scalar min/max, which only SQLite has
+            summary.min_error_rate: case(
+                (summary.min_error_rate.is_(None) | (summary.min_error_rate > rate), rate),
+                else_=summary.min_error_rate),
+            summary.max_error_rate: case(
+                (summary.max_error_rate.is_(None) | (summary.max_error_rate < rate), rate),
+                else_=summary.max_error_rate),
+            summary.last_run_id: case(
+                (summary.last_run_timestamp > record.timestamp, summary.last_run_id),
+                else_=record.id),
+            summary.last_run_timestamp: case(
+                (summary.last_run_timestamp > record.timestamp, summary.last_run_timestamp),
+                else_=record.timestamp),
+        }, synchronize_session=False)
+    
+    @staticmethod
+    def _remove_from_summary(session, ids):
+        """
+        Subtract analyses about to be deleted from the summary row, in the
+        caller's transaction; min, max and last run are then re-read
+        through the error_rate and timestamp indexes
+        """
+        removed = session.query(func.count(AnalysisResult.id),
+                                func.coalesce(func.sum(AnalysisResult.error_rate), 0.0),
+                                func.coalesce(func.sum(AnalysisResult.total_requests), 0),
+                                func.coalesce(func.sum(AnalysisResult.total_errors), 0))\
+            .filter(AnalysisResult.id.in_(ids))\
+            .one()
+        remaining = ~AnalysisResult.id.in_(ids)
+        last_run = session.query(AnalysisResult.id, AnalysisResult.timestamp)\
+            .filter(remaining)\
+            .order_by(AnalysisResult.timestamp.desc())\
+            .first()
+        summary = AnalysisSummary
+        session.query(summary).filter(summary.id == 1).update({
+            summary.total_runs: summary.total_runs - removed[0],
+            summary.error_rate_sum: summary.error_rate_sum - removed[1],
+            summary.total_requests_sum: summary.total_requests_sum - removed[2],
+            summary.total_errors_sum: summary.total_errors_sum - removed[3],
+            summary.min_error_rate: session.query(func.min(AnalysisResult.error_rate)).filter(remaining).scalar(),
+            summary.max_error_rate: session.query(func.max(AnalysisResult.error_rate)).filter(remaining).scalar(),
+            summary.last_run_id: last_run.id if last_run else None,
+            summary.last_run_timestamp: last_run.timestamp if last_run else None,
+        }, synchronize_session=False)
+    
+    @staticmethod
+    def _computed_summary(session):
+        """Summary values recomputed from the analyses themselves (full scan)"""
+        runs, rate_sum, requests_sum, errors_sum, min_rate, max_rate = session.query(
+            func.count(AnalysisResult.id),
+            func.coalesce(func.sum(AnalysisResult.error_rate), 0.0),
+            func.coalesce(func.sum(AnalysisResult.total_requests), 0),
+            func.coalesce(func.sum(AnalysisResult.total_errors), 0),
+            func.min(AnalysisResult.error_rate),
+            func.max(AnalysisResult.error_rate)
+        ).one()
+        last_run = session.query(AnalysisResult.id, AnalysisResult.timestamp)\
+            .order_by(AnalysisResult.timestamp.desc())\
+            .first()
+        return {
+            'total_runs': runs,
+            'error_rate_sum': rate_sum,
+            'total_requests_sum': requests_sum,
+            'total_errors_sum': errors_sum,
+            'min_error_rate': min_rate,
+            'max_error_rate': max_rate,
+            'last_run_id': last_run.id if last_run else None,
+            'last_run_timestamp': last_run.timestamp if last_run else None
+        }
+    
+    @serialized_write
+    def rebuild_summary(self):
+        """Recompute the summary row from every stored analysis"""
+        session = self.Session()
+        values = self._computed_summary(session)
+        summary = session.get(AnalysisSummary, 1)
+        if summary is None:
+            summary = AnalysisSummary(id=1)
+            session.add(summary)
+        for name, value in values.items():
+            setattr(summary, name, value)
+        session.commit()
+        session.close()
+    
+    def check_summary(self):
+        """
+        Compare the summary row with a full recomputation
+        Returns {field: (stored, computed)} for every field that differs
+        (running float sums are compared with a small tolerance)
+        """
+        session = self.Session()
+        computed = self._computed_summary(session)
+        summary = session.get(AnalysisSummary, 1)
+        stored = {name: getattr(summary, name) for name in computed} if summary else {}
+        session.close()
+        
+        mismatches = {}
+        for name, value in computed.items():
+            current = stored.get(name)
+            if isinstance(value, float) and isinstance(current, float):
+                if abs(current - value) <= 1e-6 * max(1.0, abs(value)):
+                    continue
+            elif current == value:
+                continue
+            mismatches[name] = (current, value)
+        return mismatches
+    
+    @staticmethod
+    def _save_children(session, analysis_id, results):
+        """Bulk insert the error status counts and top error IPs of an analysis"""
+        for model, key, counts in ((ErrorCount, 'status', results.get('error_frequency', {})),
+                                   (TopErrorIP, 'ip', results.get('top_error_ips', {}))):
+            if counts:
+                session.execute(insert(model), [
+                    {'analysis_id': analysis_id, key: str(value), 'count': count}
+                    for value, count in counts.items()
+                ])
+    
+    def get_status_history(self, status, limit=500):
+        """
+        Count of one error status in each of the last limit analyses,
+        oldest first; 0 where the status did not occur
+        """
+        session = self.Session()
+        recent = session.query(AnalysisResult.id, AnalysisResult.timestamp)\
+            .order_by(AnalysisResult.timestamp.desc())\
+            .limit(limit)\
+            .subquery()
+        rows = session.query(recent.c.id, recent.c.timestamp, func.coalesce(ErrorCount.count, 0))\
+            .outerjoin(ErrorCount, (ErrorCount.analysis_id == recent.c.id) & (ErrorCount.status == str(status)))\
+            .order_by(recent.c.timestamp)\
+            .all()
+        session.close()
+        return [{'id': analysis_id, 'timestamp': timestamp.isoformat() if timestamp else None, 'count': count}
+                for analysis_id, timestamp, count in rows]
+    
+    def get_runs_with_top_ip(self, ip, limit=None):
+        """Analyses whose top error IPs include ip, newest first, with its error count"""
+        session = self.Session()
+        query = session.query(AnalysisResult.id, AnalysisResult.timestamp, TopErrorIP.count)\
+            .join(TopErrorIP, TopErrorIP.analysis_id == AnalysisResult.id)\
+            .filter(TopErrorIP.ip == ip)\
+            .order_by(AnalysisResult.timestamp.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.all()
+        session.close()
+        return [{'id': analysis_id, 'timestamp': timestamp.isoformat() if timestamp else None, 'count': count}
+                for analysis_id, timestamp, count in rows]
+    
+    def get_error_totals(self, since=None, until=None):
+        """Errors per status summed over the analyses saved in [since, until)"""
+        session = self.Session()
+        query = session.query(ErrorCount.status, func.sum(ErrorCount.count))\
+            .join(AnalysisResult, ErrorCount.analysis_id == AnalysisResult.id)
+        if since is not None:
+            query = query.filter(AnalysisResult.timestamp >= since)
+        if until is not None:
+            query = query.filter(AnalysisResult.timestamp < until)
+        rows = query.group_by(ErrorCount.status)\
+            .order_by(func.sum(ErrorCount.count).desc())\
+            .all()
+        session.close()
+        return {status: count for status, count in rows}
+    
+    def get_distinct_counts(self, since=None, until=None):
+        """
+        Distinct counts over every analysis saved in [since, until),
+        merged from the stored sketches without rescanning any log
+        Per-hour counts are under 'hourly', keyed by 'YYYY-MM-DD HH:00'
+        """
+        session = self.Session()
+        query = session.query(DistinctSketch)\
+            .join(AnalysisResult, DistinctSketch.analysis_id == AnalysisResult.id)
+        if since is not None:
+            query = query.filter(AnalysisResult.timestamp >= since)
+        if until is not None:
+            query = query.filter(AnalysisResult.timestamp < until)
+        
+        merged = {}
+        for row in query.all():
+            key = (row.metric, row.hour)
+            if key in merged:
+                merged[key].update(row.to_sketch())
+            else:
+                merged[key] = row.to_sketch()
+        session.close()
+        
+        counts = {}
+        for (metric, hour), sketch in sorted(merged.items(), key=lambda item: (item[0][1] or -1, item[0][0])):
+            if hour is None:
+                counts[metric] = sketch.count()
+            else:
+                hour_text = (datetime(1970, 1, 1) + timedelta(hours=hour)).strftime('%Y-%m-%d %H:00')
+                counts.setdefault('hourly', {}).setdefault(hour_text, {})[metric] = sketch.count()
+        return counts
+    
     def get_recent_analyses(self, limit=10):
         """Get recent analysis results"""
-        session = Session()
+        session = self.Session()
         results = session.query(AnalysisResult)\
             .order_by(AnalysisResult.timestamp.desc())\
             .limit(limit)\
@@ -89,45 +539,322 @@ class DatabaseManager:
         session.close()
         return [r.to_dict() for r in results]
     
-    def get_statistics(self):
-        """Get overall statistics from all analyses"""
-        session = Session()
+    def get_analyses_page(self, limit=20, cursor=None, fields=None, since=None, until=None):
+        """
+        One page of analyses, newest first, with the cursor of the next page
+        (None on the last page). Pages are keyset-paginated on (timestamp,
+        id), which the timestamp index serves directly, so deep pages cost
+        the same as the first. Only the requested fields are selected, and
+        JSON fields are only decoded when asked for
+        """
+        fields = list(fields or ANALYSIS_FIELDS)
+        unknown = [name for name in fields if name not in ANALYSIS_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
         
-        # Basic stats
-        total_runs = session.query(AnalysisResult).count()
+        position = (AnalysisResult.timestamp, AnalysisResult.id)
+        columns = [getattr(AnalysisResult, name) for name in fields]
+        session = self.Session()
+        query = session.query(*position, *columns)
+        if cursor is not None:
+            query = query.filter(tuple_(*position) < tuple_(*decode_cursor(cursor)))
+        if since is not None:
+            query = query.filter(AnalysisResult.timestamp >= since)
+        if until is not None:
+            query = query.filter(AnalysisResult.timestamp < until)
+        rows = query.order_by(AnalysisResult.timestamp.desc(), AnalysisResult.id.desc())\
+            .limit(limit + 1)\
+            .all()
+        session.close()
         
-        if total_runs == 0:
+        analyses = []
+        for row in rows[:limit]:
+            analysis = {}
+            for name, value in zip(fields, row[2:]):
+                if name in JSON_FIELDS:
+                    value = json.loads(value) if value else {}
+                elif name == 'timestamp':
+                    value = value.isoformat() if value else None
+                analysis[name] = value
+            analyses.append(analysis)
+        next_cursor = encode_cursor(*rows[limit - 1][:2]) if len(rows) > limit else None
+        return {'analyses': analyses, 'next_cursor': next_cursor}
+    
+    def get_statistics(self):
+        """
+        Get overall statistics from all analyses
+        Served from the summary row and one primary-key lookup, so the cost
+        does not grow with the number of stored analyses
+        """
+        session = self.Session()
+        
+        summary = session.get(AnalysisSummary, 1)
+        if summary is None or not summary.total_runs:
             session.close()
             return {}
         
-        # Average error rate - FIXED: use func from sqlalchemy
-        avg_error_rate = session.query(
-            func.avg(AnalysisResult.error_rate)
-        ).scalar()
-        
-        # Get last run for comparison
-        last_run = session.query(AnalysisResult)\
-            .order_by(AnalysisResult.timestamp.desc())\
-            .first()
+        avg_error_rate = summary.error_rate_sum / summary.total_runs
+        last_run = session.get(AnalysisResult, summary.last_run_id) if summary.last_run_id else None
         
         session.close()
         
         return {
-            'total_runs': total_runs,
+            'total_runs': summary.total_runs,
             'avg_error_rate': round(avg_error_rate, 2) if avg_error_rate else 0,
+            'min_error_rate': summary.min_error_rate,
+            'max_error_rate': summary.max_error_rate,
             'last_run': last_run.to_dict() if last_run else None
         }
     
-    def clear_old_data(self, days_to_keep=30):
-        """Clean up old data (optional maintenance)"""
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-        session = Session()
-        deleted = session.query(AnalysisResult)\
-            .filter(AnalysisResult.timestamp < cutoff_date)\
-            .delete()
+    @serialized_write
+    def save_rollups(self, source, status_rows, method_rows=(), since_minute=None):
+        """
+        Store the per-minute rows of StreamingAggregator.minute_rollups for
+        a log file with bulk inserts. Minute rows already stored for the
+        same source at exactly the incoming minutes are replaced (a late or
+        out-of-order minute leaves the minutes around it alone), and minutes
+        inside buckets that compaction already merged are skipped, so
+        re-analyzing a file or saving a newer checkpoint never double counts
+        Rows before since_minute (an aggregator's rollup_horizon) hold only
+        newly parsed lines and are added to the stored rows instead
+        """
+        session = self.Session()
+        for model, rows in ((StatusRollup, status_rows), (MethodRollup, method_rows)):
+            rows = self._uncompacted(session, model, source, rows)
+            if not rows:
+                continue
+            runs = minute_runs(row['minute'] for row in rows
+                               if since_minute is None or row['minute'] >= since_minute)
+            for batch in range(0, len(runs), ROLLUP_DELETE_RUNS):
+                session.query(model)\
+                    .filter(model.source == source, model.resolution == 1,
+                            or_(*(model.minute.between(first, last)
+                                  for first, last in runs[batch:batch + ROLLUP_DELETE_RUNS])))\
+                    .delete(synchronize_session=False)
+            session.execute(insert(model), [{**row, 'source': source} for row in rows])
         session.commit()
         session.close()
-        return deleted
+    
+    @staticmethod
+    def _uncompacted(session, model, source, rows):
+        """Minute rows of a source that no compacted bucket already counts"""
+        if not rows:
+            return rows
+        buckets = session.query(model.minute, model.resolution)\
+            .filter(model.source == source, model.resolution > 1,
+                    model.minute <= rows[-1]['minute'],
+                    model.minute + model.resolution > rows[0]['minute'])\
+            .distinct().order_by(model.minute).all()
+        if not buckets:
+            return rows
+        
+        starts = [minute for minute, _ in buckets]
+        ends = []  # Furthest end of the buckets starting at or before each start
+        for minute, resolution in buckets:
+            ends.append(max(minute + resolution, ends[-1] if ends else 0))
+        
+        def compacted(minute):
+            index = bisect.bisect_right(starts, minute) - 1
+            return index >= 0 and minute < ends[index]
+        
+        return [row for row in rows if not compacted(row['minute'])]
+    
+    def get_status_series(self, since=None, until=None, source=None):
+        """
+        Requests, errors and error rate per minute in [since, until),
+        summed over all sources unless one is given
+        """
+        session = self.Session()
+        errors = func.sum(case((StatusRollup.status.in_(ERROR_CODES), StatusRollup.count), else_=0))
+        query = session.query(StatusRollup.minute, func.sum(StatusRollup.count), errors)
+        query = self._minute_range(query, StatusRollup, since, until, source)
+        rows = query.group_by(StatusRollup.minute).order_by(StatusRollup.minute).all()
+        session.close()
+        return [{
+            'minute': minute_datetime(minute).isoformat(),
+            'requests': requests,
+            'errors': error_count,
+            'error_rate': round(error_count / requests * 100, 2) if requests else 0
+        } for minute, requests, error_count in rows]
+    
+    def get_method_series(self, since=None, until=None, source=None):
+        """
+        Requests per minute and method in [since, until)
+        """
+        session = self.Session()
+        query = session.query(MethodRollup.minute, MethodRollup.method, func.sum(MethodRollup.count))
+        query = self._minute_range(query, MethodRollup, since, until, source)
+        rows = query.group_by(MethodRollup.minute, MethodRollup.method)\
+            .order_by(MethodRollup.minute).all()
+        session.close()
+        series = {}
+        for minute, method, count in rows:
+            series.setdefault(minute_datetime(minute).isoformat(), {})[method] = count
+        return series
+    
+    @staticmethod
+    def _minute_range(query, model, since, until, source):
+        """Restrict a rollup query to [since, until) and optionally one source"""
+        if since is not None:
+            query = query.filter(model.minute >= epoch_minute(since))
+        if until is not None:
+            query = query.filter(model.minute < epoch_minute(until))
+        if source is not None:
+            query = query.filter(model.source == source)
+        return query
+    
+    def get_checkpoint(self, log_file):
+        """Get the checkpoint for a log file, or None"""
+        session = self.Session()
+        checkpoint = session.query(Checkpoint)\
+            .filter(Checkpoint.log_file == log_file)\
+            .first()
+        session.close()
+        return checkpoint.to_dict() if checkpoint else None
+    
+    @serialized_write
+    def save_checkpoint(self, log_file, identity, offset, state):
+        """
+        Insert or update the checkpoint for a log file
+        identity holds inode, device, head_hash and head_length
+        """
+        session = self.Session()
+        checkpoint = session.query(Checkpoint)\
+            .filter(Checkpoint.log_file == log_file)\
+            .first()
+        if checkpoint is None:
+            checkpoint = Checkpoint(log_file=log_file)
+            session.add(checkpoint)
+        
+        checkpoint.inode = identity['inode']
+        checkpoint.device = identity['device']
+        checkpoint.head_hash = identity['head_hash']
+        checkpoint.head_length = identity['head_length']
+        checkpoint.offset = offset
+        checkpoint.state = None
+        checkpoint.state_zlib = zlib.compress(json.dumps(state).encode(), CHECKPOINT_COMPRESSION)
+        
+        session.commit()
+        session.close()
+    
+    def clear_old_data(self, days_to_keep=30, now=None):
+        """
+        Retention maintenance: compact rollups into coarser tiers
+        (ROLLUP_TIERS) and delete analyses older than days_to_keep.
+        Work is done in bounded batches, each in its own short transaction
+        on the writer thread, so other writes interleave and dashboard
+        readers are never blocked for long
+        Returns rows compacted, rows written, analyses deleted and timings
+        """
+        now = now or datetime.now()
+        started = time.perf_counter()
+        report = {'rows_compacted': 0, 'rows_written': 0, 'analyses_deleted': 0,
+                  'transactions': 0, 'longest_transaction_seconds': 0.0}
+        
+        resolution = 1
+        for age_days, tier_resolution in ROLLUP_TIERS:
+            cutoff = epoch_minute(now - timedelta(days=age_days)) // tier_resolution * tier_resolution
+            for model, key in ((StatusRollup, 'status'), (MethodRollup, 'method')):
+                while self._compact_batch(model, key, resolution, tier_resolution, cutoff, report):
+                    pass
+            resolution = tier_resolution
+        
+        cutoff_date = now - timedelta(days=days_to_keep)
+        while self._delete_analyses_batch(cutoff_date, report):
+            pass
+        
+        report['seconds'] = time.perf_counter() - started
+        return report
+    
+    @serialized_write
+    def _compact_batch(self, model, key, resolution, tier_resolution, cutoff, report):
+        """
+        Merge the oldest COMPACTION_BATCH_MINUTES of buckets at resolution
+        that end before cutoff into buckets of tier_resolution
+        Returns False when nothing is left to compact
+        """
+        started = time.perf_counter()
+        session = self.Session()
+        first = session.query(func.min(model.minute))\
+            .filter(model.resolution == resolution, model.minute < cutoff)\
+            .scalar()
+        if first is None:
+            session.close()
+            return False
+        
+        window_start = first // tier_resolution * tier_resolution
+        window = max(tier_resolution, COMPACTION_BATCH_MINUTES // tier_resolution * tier_resolution)
+        in_window = (model.resolution == resolution,
+                     model.minute >= window_start,
+                     model.minute < min(window_start + window, cutoff))
+        
+        rows = session.query(model.source, model.minute, getattr(model, key), model.count)\
+            .filter(*in_window).all()
+        merged = Counter()
+        for source, minute, value, count in rows:
+            merged[(source, minute // tier_resolution * tier_resolution, value)] += count
+        
+        session.query(model).filter(*in_window).delete(synchronize_session=False)
+        session.execute(insert(model), [
+            {'source': source, 'minute': minute, key: value, 'count': count, 'resolution': tier_resolution}
+            for (source, minute, value), count in merged.items()
+        ])
+        session.commit()
+        session.close()
+        
+        self._record_batch(report, started, rows_compacted=len(rows), rows_written=len(merged))
+        return True
+    
+    @serialized_write
+    def _delete_analyses_batch(self, cutoff_date, report):
+        """
+        Delete up to DELETE_BATCH_ROWS analyses older than cutoff_date
+        together with their sketches and child rows; returns False when
+        none are left
+        """
+        started = time.perf_counter()
+        session = self.Session()
+        ids = [row.id for row in session.query(AnalysisResult.id)
+               .filter(AnalysisResult.timestamp < cutoff_date)
+               .limit(DELETE_BATCH_ROWS)]
+        if ids:
+            self._remove_from_summary(session, ids)
+            for model in (DistinctSketch, ErrorCount, TopErrorIP):
+                session.query(model)\
+                    .filter(model.analysis_id.in_(ids))\
+                    .delete(synchronize_session=False)
+            session.query(AnalysisResult)\
+                .filter(AnalysisResult.id.in_(ids))\
+                .delete(synchronize_session=False)
+            session.commit()
+            self._record_batch(report, started, analyses_deleted=len(ids))
+        session.close()
+        return bool(ids)
+    
+    @staticmethod
+    def _record_batch(report, started, **counts):
+        """Add one transaction's counts and duration to a retention report"""
+        for name, count in counts.items():
+            report[name] += count
+        report['transactions'] += 1
+        report['longest_transaction_seconds'] = max(report['longest_transaction_seconds'],
+                                                    time.perf_counter() - started)
+
+# Global database instance, created (with its tables) on first use
+_db_manager = None
+_db_manager_lock = threading.Lock()
+
+def get_db_manager() -> DatabaseManager:
+    """Shared read-write DatabaseManager for DATABASE_URL"""
+    global _db_manager
+    with _db_manager_lock:
+        if _db_manager is None:
+            _db_manager = DatabaseManager()
+        return _db_manager
 
-# Global database instance
-db_manager = DatabaseManager()
\ No newline at end of file
+def __getattr__(name):
+    # Keeps `from database import db_manager` working without creating
+    # tables at import time
+    if name == 'db_manager':
+        return get_db_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Background analysis jobs for the web dashboard
+Jobs run LogAnalyzer in a bounded pool of worker processes, so parsing
+never runs on a web request thread. Progress and cancellation requests are
+shared with the workers through a multiprocessing manager
+"""
+import glob
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import JOB_WORKERS, JOB_HISTORY, LOG_DIR, ANALYSIS_LOG
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled while running"""
+
+
+def run_analysis(params: Dict, state) -> Dict:
+    """
+    Worker process entry point: analyze params['log'] and save the
+    analysis through the worker's db_manager; state is a shared dict
+    """
+    from log_analyzer import AnalysisCancelled, LogAnalyzer
+
+    def progress(requests_parsed):
+        state['requests_parsed'] = requests_parsed
+        if state.get('cancel_requested'):
+            analyzer.stop()
+
+    state['started_at'] = datetime.now().isoformat()
+    analyzer = LogAnalyzer(
+        params['log'],
+        workers=1,  # The pool already runs one job per process
+        metrics=params.get('metrics'),
+        since=datetime.fromisoformat(params['since']) if params.get('since') else None,
+        until=datetime.fromisoformat(params['until']) if params.get('until') else None,
+        progress=progress
+    )
+    try:
+        results = analyzer.analyze()
+    except AnalysisCancelled:
+        raise JobCancelled() from None
+    return {
+        'record_id': analyzer.record_id,
+        'total_requests': results.get('total_requests', 0),
+        'total_errors': results.get('total_errors', 0),
+        'error_rate': results.get('error_rate', 0.0),
+        'error_frequency': results.get('error_frequency', {})
+    }
+
+
+class JobManager:
+    """
+    Submits analysis jobs to the worker pool and tracks their status
+    The pool and the manager process start with the first job
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY,
+                 log_dir: str = LOG_DIR):
+        self.max_workers = max_workers
+        self.history = history
+        self.log_dir = os.path.realpath(log_dir)
+        self.jobs = OrderedDict()  # job id -> job record, oldest first
+        self.executor = None
+        self.manager = None
+        # Reentrant: cancelling a queued job runs its done callback in place
+        self._lock = threading.RLock()
+
+    def submit(self, params: Dict) -> Dict:
+        """
+        Queue an analysis of params['log'] (a path or glob inside the log
+        directory, or a list of them), optionally limited to
+        params['since'] / params['until'] (ISO dates) and params['metrics']
+        Raises ValueError for invalid parameters
+        """
+        params = self.validate(params)
+        with self._lock:
+            if self.executor is None:
+                # spawn: workers must not inherit the app's threads and connections
+                context = multiprocessing.get_context('spawn')
+                self.manager = context.Manager()
+                self.executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+            job_id = uuid.uuid4().hex
+            state = self.manager.dict({'requests_parsed': 0, 'cancel_requested': False})
+            job = {
+                'id': job_id,
+                'params': params,
+                'submitted_at': datetime.now().isoformat(),
+                'state': state,
+                'final_state': None,
+                'finished_at': None
+            }
+            self.jobs[job_id] = job
+            job['future'] = self.executor.submit(run_analysis, params, state)
+            job['future'].add_done_callback(lambda future: self._finish(job))
+            self._evict()
+        return self.get(job_id)
+
+    def validate(self, params: Dict) -> Dict:
+        """Normalized job parameters; ValueError if any is invalid"""
+        if not isinstance(params, dict):
+            raise ValueError("Job parameters must be a JSON object")
+        logs = params.get('log')
+        if isinstance(logs, str):
+            logs = [logs]
+        if not logs or not all(isinstance(spec, str) for spec in logs):
+            raise ValueError("'log' must be a path or glob, or a list of them")
+        for spec in logs:
+            matches = glob.glob(spec) if any(char in spec for char in '*?[') else [spec]
+            # The analyzer's own log is never analyzed (see log_analyzer.expand_log_files)
+            matches = [path for path in matches if os.path.realpath(path) != os.path.realpath(ANALYSIS_LOG)]
+            if not matches or not all(os.path.isfile(path) for path in matches):
+                raise ValueError(f"No log files match {spec}")
+            for path in matches:
+                if os.path.commonpath([self.log_dir, os.path.realpath(path)]) != self.log_dir:
+                    raise ValueError(f"{path} is outside the log directory")
+
+        window = {}
+        for name in ('since', 'until'):
+            if params.get(name):
+                if not isinstance(params[name], str):
+                    raise ValueError(f"'{name}' must be an ISO date string")
+                window[name] = datetime.fromisoformat(params[name])
+                if window[name].tzinfo is not None:
+                    # Log timestamps carry no zone
+                    raise ValueError(f"'{name}' must be a local time without a UTC offset")
+        if len(window) == 2 and window['since'] >= window['until']:
+            raise ValueError("'since' must be before 'until'")
+
+        metrics = params.get('metrics')
+        if metrics is not None:
+            if not isinstance(metrics, list) or not all(isinstance(name, str) for name in metrics):
+                raise ValueError("'metrics' must be a list of metric names")
+            from metrics import METRICS
+            unknown = [name for name in metrics if name not in METRICS]
+            if unknown:
+                raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+
+        return {'log': logs, 'since': params.get('since'), 'until': params.get('until'),
+                'metrics': metrics}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Status of one job, or None if it is unknown"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return self._describe(job) if job else None
+
+    def list(self) -> List[Dict]:
+        """Status of every tracked job, newest first"""
+        with self._lock:
+            return [self._describe(job) for job in reversed(self.jobs.values())]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Cancel a job: a queued job never starts, a running one stops at
+        its next chunk. Returns its status, or None if it is unknown
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if not job['future'].cancel() and not job['future'].done():
+                job['state']['cancel_requested'] = True
+            return self._describe(job)
+
+    def shutdown(self):
+        """Cancel queued jobs and stop the worker pool"""
+        with self._lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.manager.shutdown()
+                self.executor = self.manager = None
+
+    def _finish(self, job: Dict):
+        # Done callback: keep the final progress once the worker has finished
+        final_state = job['state'].copy() if self.manager is not None else {}
+        with self._lock:
+            job['final_state'] = final_state
+            job['finished_at'] = datetime.now().isoformat()
+
+    def _describe(self, job: Dict) -> Dict:
+        # Called with the lock held
+        future = job['future']
+        state = job['final_state'] if job['final_state'] is not None else job['state'].copy()
+        description = {
+            'id': job['id'],
+            'params': job['params'],
+            'submitted_at': job['submitted_at'],
+            'started_at': state.get('started_at'),
+            'requests_parsed': state.get('requests_parsed', 0)
+        }
+        if future.cancelled():
+            description['status'] = 'cancelled'
+        elif not future.done():
+            description['status'] = 'cancelling' if state.get('cancel_requested') else \
+                'running' if state.get('started_at') else 'queued'
+        else:
+            description['finished_at'] = job['finished_at']
+            error = future.exception()
+            if isinstance(error, JobCancelled):
+                description['status'] = 'cancelled'
+            elif error is not None:
+                description['status'] = 'failed'
+                description['error'] = str(error) or type(error).__name__
+            else:
+                description['status'] = 'completed'
+                description['result'] = future.result()
+        return description
+
+    def _evict(self):
+        # Forget the oldest finished jobs beyond the history size
+        finished = [job_id for job_id, job in self.jobs.items() if job['future'].done()]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
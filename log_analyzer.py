@@ -1,17 +1,30 @@
 """
 Main log analyzer module with comprehensive error handling and logging
+Heavy modules are imported by the phase that needs them: pandas with the
+first parse, SQLAlchemy with the first database access and matplotlib
+only when reports are generated, so short CLI paths start quickly
 """
+from __future__ import annotations
+
+import argparse
+import glob
 import logging
+import os
+import threading
 import time
 from datetime import datetime
-from typing import Dict, Any
-import pandas as pd
-from tqdm import tqdm
+from typing import TYPE_CHECKING, Dict, Any, Callable, List, Optional, Tuple, Union
+
+from checkpoint import file_identity, is_same_file, complete_lines_end
+from compression import file_compression
+from config import (INPUT_LOG, ANALYSIS_LOG, CHUNK_SIZE, PARSE_WORKERS, USE_MMAP, INCREMENTAL,
+                    READ_BLOCK_SIZE, FOLLOW_POLL_INTERVAL, SNAPSHOT_INTERVAL, APPROXIMATE_TOP_K,
+                    TOP_K_ERROR, CHECKPOINT_MINUTES)
 
-from log_parser import LogParser
-from config import INPUT_LOG, ANALYSIS_LOG, CHUNK_SIZE
-from report_generator import ReportGenerator
-from database import db_manager
+if TYPE_CHECKING:
+    from aggregator import StreamingAggregator
+    from database import DatabaseManager
+    from report_generator import ReportGenerator
 
 # Configure logging for audit trail
 logging.basicConfig(
@@ -25,161 +38,586 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+def database() -> DatabaseManager:
+    """Shared DatabaseManager, created with its tables on first use"""
+    from database import get_db_manager
+    return get_db_manager()
+
+def expand_log_files(log_file: Union[str, List[str]]) -> List[str]:
+    """
+    Expand a path, a glob pattern or a list of either into log file paths
+    Glob matches are sorted; duplicates are dropped keeping the first one.
+    The analyzer's own ANALYSIS_LOG is skipped, since it grows during the run
+    """
+    specs = [log_file] if isinstance(log_file, str) else list(log_file)
+    paths = []
+    for spec in specs:
+        is_pattern = any(char in spec for char in '*?[')
+        paths.extend(sorted(glob.glob(spec)) if is_pattern else [spec])
+    own_log = os.path.realpath(ANALYSIS_LOG)
+    return [path for path in dict.fromkeys(paths) if os.path.realpath(path) != own_log]
+
+class AnalysisCancelled(Exception):
+    """Raised by analyze() when stop() is called before parsing finishes"""
+
 class LogAnalyzer:
     """
     Main analyzer class orchestrating parsing, analysis, and reporting
     """
     
-    def __init__(self, log_file: str = INPUT_LOG):
-        self.log_file = log_file
-        self.parser = LogParser()
-        self.reporter = ReportGenerator()
+    def __init__(self, log_file: Union[str, List[str]] = INPUT_LOG,
+                 workers: int = PARSE_WORKERS, incremental: bool = INCREMENTAL,
+                 metrics: List[str] = None, approximate: bool = APPROXIMATE_TOP_K,
+                 top_k_error: float = TOP_K_ERROR, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None, progress: Callable[[int], None] = None):
+        # A path, a glob such as logs/server.log* or a list of either
+        self.log_files = expand_log_files(log_file)
+        self.log_file = self.log_files[0] if len(self.log_files) == 1 else log_file
+        self.workers = workers
+        self.incremental = incremental
+        # Metric names to compute (None for all); the parser then extracts
+        # only the columns those metrics read
+        self.metrics = metrics
+        from aggregator import projected_parser
+        self.parser = projected_parser(metrics)
+        # Time window: only lines stamped in [since, until) are counted; the
+        # timestamp column is then always parsed
+        self.time_window = None
+        if since is not None or until is not None:
+            self.time_window = (epoch_seconds_of(since) if since else None,
+                                epoch_seconds_of(until) if until else None)
+            if metrics is not None:
+                from log_parser import LogParser
+                self.parser = LogParser(columns=set(self.parser.fields) | {'timestamp'})
+        # Called with the number of requests parsed so far after each chunk
+        self.progress = progress
+        self._requests_parsed = 0
+        self.record_id = None
+        # Approximate mode counts IPs and error paths with Space-Saving
+        # summaries whose counts are off by at most top_k_error * total
+        self.top_k_error = top_k_error if approximate else None
+        self._reporter = None
         self.results = {}
+        self._checkpoints = {}
+        self._stop_event = threading.Event()
         
+    @property
+    def reporter(self) -> ReportGenerator:
+        """Report generator, created (importing matplotlib) on first use"""
+        if self._reporter is None:
+            from report_generator import ReportGenerator
+            self._reporter = ReportGenerator()
+        return self._reporter
+    
     def analyze(self) -> Dict[str, Any]:
         """
         Main analysis pipeline with performance tracking
         """
-        logger.info(f"Starting analysis of {self.log_file}")
+        from aggregator import StreamingAggregator
+        
+        logger.info(f"Starting analysis of {', '.join(self.log_files) or self.log_file}")
         start_time = time.time()
         
         try:
-            # Phase 1: Parse and collect data
-            parsed_data = self._parse_log_file()
+            if not self.log_files:
+                raise FileNotFoundError(f"No log files match {self.log_file}")
+            self._requests_parsed = 0
+            self._stop_event.clear()
+            # log file -> (identity, offset) of checkpoints to save with the results
+            self._checkpoints = {}
             
-            if parsed_data.empty:
+            # Phase 1: Parse and fold chunks into streaming accumulators
+            per_file = self._aggregate_log_files()
+            aggregator = StreamingAggregator(metrics=self.metrics, top_k_error=self.top_k_error)
+            for partial in per_file.values():
+                aggregator.merge(partial)
+            
+            if aggregator.total_requests == 0:
                 logger.error("No valid log entries found")
+                for path, (identity, offset) in self._checkpoints.items():
+                    self._save_checkpoint(path, identity, offset, per_file[path])
                 return {}
             
             # Phase 2: Analyze error distribution
             logger.info("Analyzing error distribution...")
-            analysis_results = self.parser.analyze_error_distribution(parsed_data)
+            analysis_results = aggregator.error_distribution()
             
-            # Phase 3: Generate detailed metrics
-            detailed_metrics = self._calculate_detailed_metrics(parsed_data)
+            # Phase 3: Generate detailed metrics; time-ordered metrics
+            # k-way merge the per-file streams instead of sorting globally
+            detailed_metrics = aggregator.detailed_metrics(
+                burst_streams=[partial.error_second_stream() for partial in per_file.values()]
+            )
             
             # Combine results
             self.results = {
                 **analysis_results,
                 'detailed_metrics': detailed_metrics,
-                'parsed_data': parsed_data,
+                'log_files': self.log_files,
                 'execution_time': time.time() - start_time
             }
+            if len(per_file) > 1:
+                self.results['per_file'] = {
+                    path: {**partial.error_distribution(),
+                           'detailed_metrics': partial.detailed_metrics()}
+                    for path, partial in per_file.items()
+                }
             
             try:
-                record_id = db_manager.save_analysis(analysis_results)
+                record_id = database().save_analysis(analysis_results, aggregator.distinct_sketches())
+                self.record_id = record_id
                 logger.info(f"Analysis saved to database with ID: {record_id}")
+                for path, partial in per_file.items():
+                    self._save_rollups(path, partial)
+                # Only once the rollups are saved, so checkpoints can drop rolled-up minutes;
+                # if saving failed the next run parses the same tail again
+                for path, (identity, offset) in self._checkpoints.items():
+                    self._save_checkpoint(path, identity, offset, per_file[path], rolled_up=True)
             except Exception as e:
                 logger.error(f"Failed to save to database: {e}")
             logger.info(f"Analysis completed in {self.results['execution_time']:.2f} seconds")
             
             return self.results
             
+        except AnalysisCancelled:
+            logger.info("Analysis cancelled")
+            raise
         except Exception as e:
             logger.error(f"Analysis failed: {str(e)}", exc_info=True)
             raise
     
-    def _parse_log_file(self) -> pd.DataFrame:
+    def _aggregate_log_files(self) -> Dict[str, StreamingAggregator]:
+        """
+        Aggregate every input file separately
+        Several files are parsed concurrently, one file per worker process
+        """
+        from tqdm import tqdm
+        from aggregator import aggregate_files_parallel
+        
+        if len(self.log_files) > 1 and self.workers > 1 and not self.incremental and not self.time_window:
+            logger.info(f"Parsing {len(self.log_files)} files with {self.workers} worker processes")
+            per_file = dict(tqdm(
+                aggregate_files_parallel(self.log_files, CHUNK_SIZE, self.workers, self.metrics,
+                                         self.top_k_error),
+                desc="Parsing log files",
+                unit="file",
+                total=len(self.log_files)
+            ))
+            for path, partial in per_file.items():
+                logger.info(f"Parsed {partial.total_requests} valid log entries from {path}")
+            return per_file
+        
+        return {path: self._aggregate_log_file(path) for path in self.log_files}
+    
+    def _aggregate_log_file(self, log_file: str) -> StreamingAggregator:
+        """
+        Parse log file chunk by chunk, folding each chunk into the
+        aggregator as it arrives so no combined DataFrame is built
+        """
+        logger.info(f"Parsing log file: {log_file}")
+        
+        if self.incremental and self.time_window:
+            # A checkpoint holds aggregates over the whole file
+            logger.info("Time window given, ignoring incremental mode")
+            aggregator = self._aggregate_range(log_file)
+        elif self.incremental and file_compression(log_file) is not None:
+            # Offsets into a compressed stream cannot be resumed
+            logger.info("Compressed input, ignoring incremental mode")
+            aggregator = self._aggregate_range(log_file)
+        elif self.incremental:
+            aggregator = self._aggregate_incremental(log_file)
+        else:
+            aggregator = self._aggregate_range(log_file)
+        
+        logger.info(f"Parsed {aggregator.total_requests} valid log entries")
+        return aggregator
+    
+    def _aggregate_incremental(self, log_file: str) -> StreamingAggregator:
+        """
+        Resume from the saved checkpoint and parse only the appended tail
+        Re-reads the file from the start when it was rotated or truncated
+        """
+        identity = file_identity(log_file)
+        aggregator, start = self._restore_checkpoint(log_file, identity)
+        
+        # Stop at the last complete line; a partial line is left for the next run
+        end = complete_lines_end(log_file, identity['size'])
+        if end > start:
+            aggregator.merge(self._aggregate_range(log_file, start, end))
+        
+        # Saved by analyze() together with the results
+        self._checkpoints[log_file] = (identity, end)
+        return aggregator
+    
+    def _restore_checkpoint(self, log_file: str, identity: Dict) -> Tuple[StreamingAggregator, int]:
         """
-        Parse log file with chunking for memory efficiency
+        Load the saved aggregates and offset if the checkpoint still
+        applies to the log file, otherwise start from scratch
         """
-        logger.info(f"Parsing log file: {self.log_file}")
+        from aggregator import StreamingAggregator, select_metrics
         
-        parsed_chunks = []
-        invalid_lines = 0
+        checkpoint = database().get_checkpoint(os.path.abspath(log_file))
+        
+        if checkpoint and is_same_file(checkpoint, identity, log_file) and \
+                select_metrics(checkpoint['state'].get('metrics')) == select_metrics(self.metrics) and \
+                checkpoint['state'].get('top_k_error') == self.top_k_error:
+            logger.info(f"Resuming from checkpoint at byte {checkpoint['offset']:,}")
+            return StreamingAggregator.from_state(checkpoint['state']), checkpoint['offset']
+        
+        if checkpoint:
+            logger.info("Log file was rotated or truncated, or the metric selection or counting "
+                        "mode changed; re-reading from the start")
+        return StreamingAggregator(metrics=self.metrics, top_k_error=self.top_k_error), 0
+    
+    def _save_checkpoint(self, log_file: str, identity: Dict, offset: int,
+                         aggregator: StreamingAggregator, rolled_up: bool = False):
+        """
+        Persist the offset and running aggregates for the next run
+        Once the aggregator's minutes are in the rollup tables (rolled_up),
+        only the newest CHECKPOINT_MINUTES of them are kept
+        """
+        try:
+            state = aggregator.to_state(keep_minutes=CHECKPOINT_MINUTES if rolled_up else None)
+            database().save_checkpoint(os.path.abspath(log_file), identity, offset, state)
+            logger.info(f"Checkpoint saved at byte {offset:,}")
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint: {e}")
+    
+    def _aggregate_range(self, log_file: str, start: int = 0, end: int = None) -> StreamingAggregator:
+        """
+        Aggregate the lines in [start, end) of a log file
+        (the whole file by default)
+        """
+        from tqdm import tqdm
+        from aggregator import StreamingAggregator, aggregate_file_parallel
+        
+        aggregator = StreamingAggregator(metrics=self.metrics, top_k_error=self.top_k_error)
+        
+        # Worker processes aggregate whole ranges, so a time window is
+        # applied by parsing serially
+        if self.workers > 1 and not self.time_window:
+            logger.info(f"Parsing with {self.workers} worker processes")
+            for partial in tqdm(
+                aggregate_file_parallel(log_file, CHUNK_SIZE, self.workers, start, end, self.metrics,
+                                        self.top_k_error),
+                desc="Parsing log file",
+                unit="range"
+            ):
+                aggregator.merge(partial)
+                self._report_progress(partial.total_requests)
+            return aggregator
+        
+        if start == 0 and end is None:
+            chunks = self.parser.parse_file_chunks(log_file, CHUNK_SIZE, use_mmap=USE_MMAP)
+        else:
+            chunks = self.parser.parse_byte_range(log_file, start, end, CHUNK_SIZE)
         
         # Parse file in chunks with progress bar
-        for chunk_df in tqdm(
-            self.parser.parse_file_chunks(self.log_file, CHUNK_SIZE),
-            desc="Parsing log file",
-            unit="chunk"
-        ):
-            if not chunk_df.empty:
-                parsed_chunks.append(chunk_df)
+        for chunk_df in tqdm(chunks, desc="Parsing log file", unit="chunk"):
+            if self.time_window:
+                chunk_df = self._in_time_window(chunk_df)
+            aggregator.update(chunk_df)
+            self._report_progress(len(chunk_df))
         
-        # Combine all chunks
-        if parsed_chunks:
-            combined_df = pd.concat(parsed_chunks, ignore_index=True)
-            logger.info(f"Parsed {len(combined_df)} valid log entries")
-            logger.info(f"Skipped {invalid_lines} invalid/malformed entries")
-            return combined_df
+        return aggregator
+    
+    def _in_time_window(self, chunk_df):
+        """
+        Rows of a chunk stamped within the time window (unparseable
+        timestamps are outside every window)
+        """
+        from log_parser import MISSING_TIME
         
-        return pd.DataFrame()
+        since, until = self.time_window
+        timestamps = chunk_df['timestamp'].to_numpy()
+        keep = timestamps != MISSING_TIME
+        if since is not None:
+            keep &= timestamps >= since
+        if until is not None:
+            keep &= timestamps < until
+        return chunk_df if keep.all() else chunk_df[keep]
+    
+    def _report_progress(self, requests: int):
+        self._requests_parsed += requests
+        if self.progress is not None:
+            self.progress(self._requests_parsed)
+        if self._stop_event.is_set():
+            raise AnalysisCancelled(f"Stopped after {self._requests_parsed:,} requests")
     
-    def _calculate_detailed_metrics(self, df: pd.DataFrame) -> Dict:
+    def follow(self, poll_interval: float = FOLLOW_POLL_INTERVAL,
+               snapshot_interval: float = SNAPSHOT_INTERVAL):
         """
-        Calculate additional metrics for comprehensive analysis
+        Continuously analyze the log file as it grows, like tail -F
+        New lines are parsed in micro-batches into rolling aggregates and a
+        snapshot is saved to the database every snapshot_interval seconds.
+        Handles rotation (new file at the same path) and truncation, and
+        sleeps between polls while the file is idle. Runs until stop() is
+        called or the process is interrupted.
         """
-        metrics = {}
+        from aggregator import StreamingAggregator
         
-        # Request methods distribution
-        metrics['method_distribution'] = df['method'].value_counts().to_dict()
+        if len(self.log_files) != 1:
+            raise ValueError("Follow mode needs exactly one log file")
         
-        # Hourly error pattern
-        if 'timestamp' in df.columns:
-            try:
-                df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-                error_mask = df['status'].apply(self.parser.is_error)
-                hourly_errors = df[error_mask].groupby('hour').size().to_dict()
-                metrics['hourly_error_pattern'] = hourly_errors
-            except Exception as e:
-                logger.warning(f"Could not calculate hourly patterns: {e}")
+        logger.info(f"Following {self.log_file}")
+        self._stop_event.clear()
         
-        # IP addresses with most requests (successful and errors)
-        metrics['top_request_ips'] = df['ip'].value_counts().head(10).to_dict()
+        if not self._wait_for_file(poll_interval):
+            return self.results
+        codec = file_compression(self.log_file)
+        if codec:
+            raise ValueError(f"Follow mode cannot read {codec}-compressed {self.log_file}")
         
-        # Most common error paths/URLs
-        error_df = df[df['status'].apply(self.parser.is_error)]
-        if not error_df.empty and 'url' in error_df.columns:
-            metrics['error_paths'] = error_df['url'].value_counts().head(10).to_dict()
+        offset = 0
+        if self.incremental:
+            aggregator, offset = self._restore_checkpoint(self.log_file, file_identity(self.log_file))
+        else:
+            aggregator = StreamingAggregator(metrics=self.metrics, top_k_error=self.top_k_error)
         
-        return metrics
+        f = open(self.log_file, 'rb')
+        f.seek(offset)
+        pending = b''
+        last_snapshot = time.time()
+        dirty = False
+        
+        try:
+            while not self._stop_event.is_set():
+                data = f.read(READ_BLOCK_SIZE)
+                
+                if data:
+                    # Micro-batch: every complete line read so far
+                    pending += data
+                    newline = pending.rfind(b'\n')
+                    if newline != -1:
+                        aggregator.update(self.parser.parse_bytes_block(pending[:newline + 1]))
+                        pending = pending[newline + 1:]
+                        dirty = True
+                else:
+                    f, reopened = self._check_rotation(f)
+                    if reopened:
+                        # The old file ended without a newline on its last line
+                        if pending:
+                            aggregator.update(self.parser.parse_bytes_block(pending))
+                            pending = b''
+                    else:
+                        self._stop_event.wait(poll_interval)
+                
+                if dirty and time.time() - last_snapshot >= snapshot_interval:
+                    self._flush_snapshot(aggregator, f, f.tell() - len(pending))
+                    last_snapshot = time.time()
+                    dirty = False
+        
+        except KeyboardInterrupt:
+            logger.info("Follow mode interrupted")
+        finally:
+            if dirty:
+                self._flush_snapshot(aggregator, f, f.tell() - len(pending))
+            f.close()
+        
+        return self.results
+    
+    def stop(self):
+        """
+        Ask a running follow() loop to flush and return, or a running
+        analyze() to raise AnalysisCancelled after its current chunk
+        """
+        self._stop_event.set()
+    
+    def _wait_for_file(self, poll_interval: float) -> bool:
+        """
+        Poll until the followed file exists, like tail -F
+        Returns False if stop() was called or the wait was interrupted first
+        """
+        try:
+            while not os.path.exists(self.log_file):
+                if self._stop_event.is_set():
+                    return False
+                logger.debug(f"Waiting for {self.log_file} to appear")
+                self._stop_event.wait(poll_interval)
+        except KeyboardInterrupt:
+            logger.info("Follow mode interrupted")
+            return False
+        return not self._stop_event.is_set()
     
-    def generate_report(self, output_file: str = None):
+    def _check_rotation(self, f) -> Tuple[Any, bool]:
+        """
+        Called when the open file is at EOF
+        Returns the file to keep reading and whether it was reopened
+        """
+        try:
+            path_stat = os.stat(self.log_file)
+        except FileNotFoundError:
+            # Rotated away and not yet recreated
+            return f, False
+        
+        open_stat = os.fstat(f.fileno())
+        if (path_stat.st_ino, path_stat.st_dev) != (open_stat.st_ino, open_stat.st_dev):
+            # Drain whatever was written to the old file before switching
+            if f.read(1):
+                f.seek(-1, os.SEEK_CUR)
+                return f, False
+            logger.info(f"{self.log_file} was rotated, reopening")
+            f.close()
+            return open(self.log_file, 'rb'), True
+        
+        if open_stat.st_size < f.tell():
+            logger.info(f"{self.log_file} was truncated, reading from the start")
+            f.seek(0)
+            return f, True
+        
+        return f, False
+    
+    def _flush_snapshot(self, aggregator: StreamingAggregator, f, offset: int):
+        """
+        Save the rolling aggregates as an analysis record
+        (and as a checkpoint in incremental mode)
+        """
+        if aggregator.total_requests == 0:
+            return
+        
+        analysis_results = aggregator.error_distribution()
+        self.results = {
+            **analysis_results,
+            'detailed_metrics': aggregator.detailed_metrics()
+        }
+        
+        rolled_up = False
+        try:
+            record_id = database().save_analysis(analysis_results, aggregator.distinct_sketches())
+            logger.info(f"Snapshot saved to database with ID: {record_id}")
+            self._save_rollups(self.log_file, aggregator)
+            rolled_up = True
+        except Exception as e:
+            logger.error(f"Failed to save snapshot: {e}")
+        
+        if self.incremental:
+            identity = file_identity(self.log_file)
+            if identity['inode'] == os.fstat(f.fileno()).st_ino:
+                self._save_checkpoint(self.log_file, identity, offset, aggregator, rolled_up)
+    
+    def _save_rollups(self, log_file: str, aggregator: StreamingAggregator):
+        """
+        Bulk insert the per-minute status and method counts of one log file
+        """
+        status_rows, method_rows = aggregator.minute_rollups()
+        if status_rows or method_rows:
+            database().save_rollups(os.path.abspath(log_file), status_rows, method_rows,
+                                    since_minute=aggregator.rollup_horizon)
+            logger.info(f"Saved {len(status_rows) + len(method_rows):,} minute rollup rows")
+        # Late lines before the checkpoint's minutes are now added to the tables
+        aggregator.forget_rolled_up_minutes()
+    
+    def generate_report(self, output_file: str = None, wait: bool = True):
         """
         Generate comprehensive report with visualizations
+        Charts render in worker processes; with wait=False this returns as
+        soon as they are queued and wait_for_reports() collects them
         """
         if not self.results:
             self.analyze()
         
         self.reporter.generate_text_report(self.results, output_file)
-        self.reporter.generate_visualizations(self.results)
+        self.reporter.generate_visualizations(self.results, wait=False)
         
+        if wait:
+            self.wait_for_reports()
+    
+    def wait_for_reports(self):
+        """
+        Wait for charts queued by generate_report and stop the render pool
+        """
+        if self._reporter is None:
+            return
+        try:
+            self._reporter.wait()
+        finally:
+            self._reporter.close()
         logger.info(f"Reports generated successfully")
 
+def epoch_seconds_of(moment: datetime) -> int:
+    """Epoch seconds of a naive datetime, on the same clock as parsed log timestamps"""
+    return int((moment - datetime(1970, 1, 1)).total_seconds())
+
 def main():
     """
     Main execution function
     """
+    arg_parser = argparse.ArgumentParser(description="Analyze server logs")
+    arg_parser.add_argument('--log', nargs='+', default=[INPUT_LOG],
+                            help="Log files or glob patterns to analyze as one dataset")
+    arg_parser.add_argument('--incremental', action='store_true', default=INCREMENTAL,
+                            help="Resume from the last checkpoint and parse only new lines")
+    arg_parser.add_argument('--follow', action='store_true',
+                            help="Keep running and analyze new lines as they are appended")
+    arg_parser.add_argument('--metrics', nargs='+',
+                            help="Compute only these metrics and parse only the fields they need")
+    arg_parser.add_argument('--approximate', action='store_true', default=APPROXIMATE_TOP_K,
+                            help="Count IPs and error paths in bounded memory with error intervals")
+    arg_parser.add_argument('--top-k-error', type=float, default=TOP_K_ERROR,
+                            help="Largest overcount in approximate mode, as a fraction of the total")
+    arg_parser.add_argument('--check-summary', action='store_true',
+                            help="Verify the stored statistics summary and rebuild it if it drifted")
+    arg_parser.add_argument('--summary-only', action='store_true',
+                            help="Print the console summary without generating report files or charts")
+    args = arg_parser.parse_args()
+    
+    if args.metrics:
+        # Checked here rather than with choices= so --help does not import pandas
+        from metrics import METRICS
+        unknown = [name for name in args.metrics if name not in METRICS]
+        if unknown:
+            arg_parser.error(f"unknown metrics: {', '.join(unknown)} "
+                             f"(choose from {', '.join(METRICS)})")
+    
+    if args.check_summary:
+        mismatches = database().check_summary()
+        if not mismatches:
+            print("Statistics summary is consistent")
+            return
+        for name, (stored, computed) in mismatches.items():
+            print(f"  {name}: stored {stored}, computed {computed}")
+        database().rebuild_summary()
+        print("Statistics summary rebuilt")
+        return
+    
     try:
         # Initialize analyzer
-        analyzer = LogAnalyzer()
+        analyzer = LogAnalyzer(args.log, incremental=args.incremental, metrics=args.metrics,
+                               approximate=args.approximate, top_k_error=args.top_k_error)
+        
+        if args.follow:
+            analyzer.follow()
+            return
         
         # Perform analysis
         results = analyzer.analyze()
         
-        # Generate reports
-        analyzer.generate_report()
-        
-        # Print summary to console
-        print("\n" + "="*60)
-        print("LOG ANALYSIS SUMMARY")
-        print("="*60)
-        print(f"Total Requests: {results.get('total_requests', 0):,}")
-        print(f"Total Errors: {results.get('total_errors', 0):,}")
-        print(f"Error Rate: {results.get('error_rate', 0):.2f}%")
-        print(f"Execution Time: {results.get('execution_time', 0):.2f} seconds")
-        
-        if 'error_frequency' in results:
-            print("\nTop Error Codes:")
-            for code, count in sorted(results['error_frequency'].items(), 
-                                     key=lambda x: x[1], reverse=True)[:5]:
-                print(f"  {code}: {count:,}")
-        
-        print("\n" + "="*60)
+        # Generate reports; charts render in the background while the summary prints
+        try:
+            if not args.summary_only:
+                analyzer.generate_report(wait=False)
+            
+            # Print summary to console
+            print("\n" + "="*60)
+            print("LOG ANALYSIS SUMMARY")
+            print("="*60)
+            print(f"Total Requests: {results.get('total_requests', 0):,}")
+            print(f"Total Errors: {results.get('total_errors', 0):,}")
+            print(f"Error Rate: {results.get('error_rate', 0):.2f}%")
+            print(f"Execution Time: {results.get('execution_time', 0):.2f} seconds")
+            
+            if 'error_frequency' in results:
+                print("\nTop Error Codes:")
+                for code, count in sorted(results['error_frequency'].items(), 
+                                         key=lambda x: x[1], reverse=True)[:5]:
+                    print(f"  {code}: {count:,}")
+            
+            print("\n" + "="*60)
+        finally:
+            # On every path: report render failures and stop the render pool
+            analyzer.wait_for_reports()
         
     except FileNotFoundError:
-        logger.error(f"Log file not found: {INPUT_LOG}")
+        logger.error(f"Log file not found: {' '.join(args.log)}")
         print("ERROR: Log file not found. Run log_generator.py first.")
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
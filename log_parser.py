@@ -2,22 +2,72 @@
 Log parsing utilities with optimized regex and error handling
 Handles malformed entries gracefully
 """
+import io
+import ipaddress
+import mmap
+import os
 import re
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from pandas.api.types import infer_dtype
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple, Optional
 import logging
 from collections import defaultdict
-from config import LOG_PATTERN, ERROR_CODES
+from compression import OPENERS, detect_compression, newline_blocks, open_log
+from config import (LOG_PATTERN, TIMESTAMP_FORMAT, HTTP_METHODS, OTHER_METHOD,
+                    READ_BLOCK_SIZE)
+
+# Typed chunk layout: status int16, method categorical over METHOD_CATEGORIES,
+# ip uint32, timestamp int64 epoch seconds and url dictionary-encoded.
+# IPv4 values below IP_TABLE_SIZE (0.0.0.0/8, never a client address) are
+# instead indexes into the chunk's side table df.attrs['ip_table'], which
+# holds values that are not IPv4 addresses
+INVALID_STATUS = -1
+MISSING_TIME = np.iinfo(np.int64).min
+IP_TABLE_SIZE = 1 << 24
+METHOD_CATEGORIES = HTTP_METHODS + (OTHER_METHOD,)
+EPOCH = pd.Timestamp(0)
+
+# Byte positions of the fields in a TIMESTAMP_FORMAT value (YYYY-MM-DD HH:MM:SS)
+TIMESTAMP_LENGTH = 19
+TIMESTAMP_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+TIMESTAMP_SEPARATORS = [4, 7, 10, 13, 16]
+SEPARATOR_BYTES = np.frombuffer(b'-- ::', dtype=np.uint8)
+DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
 
 class LogParser:
     """
     Efficient log parser with compiled regex for performance
     """
     
-    def __init__(self):
+    def __init__(self, columns: Optional[Iterable[str]] = None):
+        # Column projection: groups outside columns become non-capturing, so
+        # lines are validated as before but those fields are never extracted
+        pattern = LOG_PATTERN
+        if columns is not None:
+            keep = set(columns) | {'status'}  # Every analysis needs the status
+            pattern = re.sub(r'\(\?P<(\w+)>',
+                             lambda group: group.group(0) if group.group(1) in keep else '(?:',
+                             LOG_PATTERN)
+        
         # Compile regex once for reuse (performance optimization)
-        self.log_pattern = re.compile(LOG_PATTERN)
-        self.error_codes = ERROR_CODES
+        self.log_pattern = re.compile(pattern)
+        self.fields = list(self.log_pattern.groupindex)
+        self.status_pattern = re.compile(r'\d{3}')
+        self.ip_pattern = re.compile(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}')
+        
+        # Block pattern for vectorized parsing: every non-blank line either
+        # matches LOG_PATTERN or is captured whole in the 'unmatched' group
+        self.block_pattern = re.compile(
+            r'^[^\S\n]*(?:' + pattern + r'|(?P<unmatched>\S.*))',
+            re.MULTILINE
+        )
+        # Same pattern compiled for bytes, used by the mmap reader
+        self.bytes_block_pattern = re.compile(
+            self.block_pattern.pattern.encode('ascii'),
+            re.MULTILINE
+        )
         
     def parse_line(self, line: str) -> Optional[Dict]:
         """
@@ -57,7 +107,7 @@ class LogParser:
                 status = parts[-1]  # Status code is usually last
                 
                 # Validate extracted data
-                if re.match(r'\d{3}', status) and re.match(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', ip):
+                if self.status_pattern.match(status) and self.ip_pattern.match(ip):
                     return {
                         'timestamp': timestamp,
                         'ip': ip,
@@ -69,56 +119,483 @@ class LogParser:
         
         return None
     
-    def is_error(self, status_code: str) -> bool:
+    def parse_block(self, text: str) -> pd.DataFrame:
+        """
+        Vectorized parse of a block of raw log lines
+        Extracts all fields with a single regex pass over the block;
+        only lines that miss the fast path go through the fallback parser
+        """
+        return self._rows_to_frame(self.block_pattern.findall(text))
+    
+    def parse_bytes_block(self, data: bytes) -> pd.DataFrame:
+        """
+        Vectorized parse of a block of undecoded log bytes
+        Matches the bytes-compiled pattern and decodes only the captured
+        fields, never the whole line
+        """
+        return self._rows_to_frame(self.bytes_block_pattern.findall(data), encoded=True)
+    
+    def _rows_to_frame(self, rows: List[tuple], encoded: bool = False) -> pd.DataFrame:
+        """
+        Build a typed chunk DataFrame from block pattern matches
+        The last group of each row holds the raw line when LOG_PATTERN missed.
+        Captured bytes are never decoded per row, only per distinct value
+        """
+        if not rows:
+            return pd.DataFrame()
+        
+        columns = list(zip(*rows))
+        unmatched = np.array(columns.pop(), dtype=object)
+        data = {field: np.array(col, dtype=object) for field, col in zip(self.fields, columns)}
+        
+        failed = np.flatnonzero(unmatched.astype(bool))
+        if len(failed) > 0:
+            # Slow path only for the rows the block pattern could not handle
+            keep = np.ones(len(unmatched), dtype=bool)
+            for pos in failed:
+                line = unmatched[pos]
+                if encoded:
+                    line = line.decode('utf-8', errors='replace')
+                parsed = self._fallback_parse(line.rstrip())
+                if parsed is None:
+                    keep[pos] = False
+                    continue
+                for field in self.fields:
+                    data[field][pos] = parsed.get(field, np.nan)
+            data = {field: values[keep] for field, values in data.items()}
+        
+        return build_chunk(data)
+    
+    def iter_byte_blocks(self, filepath: str, block_size: int = READ_BLOCK_SIZE):
         """
-        Check if status code represents an error
+        Yield newline-aligned byte blocks of a file
+        Memory-maps the file when possible and falls back to buffered
+        reads for files that cannot be mapped (pipes, empty or special
+        files). Compressed files are decompressed as a stream
         """
-        return status_code in self.error_codes
+        with open(filepath, 'rb') as f:
+            codec = detect_compression(f)
+            if codec is not None:
+                with OPENERS[codec](f) as stream:
+                    yield from newline_blocks(iter(lambda: stream.read(block_size), b''))
+                return
+            
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                yield from newline_blocks(iter(lambda: f.read(block_size), b''))
+                return
+            
+            with mapped:
+                pos, size = 0, len(mapped)
+                while pos < size:
+                    stop = min(pos + block_size, size)
+                    if stop < size:
+                        newline = mapped.rfind(b'\n', pos, stop)
+                        if newline == -1:
+                            # Line longer than a block: extend to its end
+                            newline = mapped.find(b'\n', stop)
+                        stop = size if newline == -1 else newline + 1
+                    yield mapped[pos:stop]
+                    pos = stop
     
-    def parse_file_chunks(self, filepath: str, chunk_size: int = 10000):
+    def parse_file_chunks(self, filepath: str, chunk_size: int = 10000,
+                          vectorized: bool = True, use_mmap: bool = False):
         """
         Parse large files in chunks to conserve memory
         Generator yields chunks of parsed data
+        
+        vectorized=True reads blocks of chunk_size raw lines and parses each
+        block at once with parse_block; vectorized=False keeps the original
+        line-by-line path. use_mmap=True instead reads READ_BLOCK_SIZE byte
+        blocks through iter_byte_blocks and never decodes whole lines.
+        gzip, bz2 and xz files are decompressed on the fly in every mode
+        """
+        if not vectorized:
+            yield from self._parse_file_lines(filepath, chunk_size)
+            return
+        
+        if use_mmap:
+            for block in self.iter_byte_blocks(filepath):
+                chunk = self.parse_bytes_block(block)
+                if not chunk.empty:
+                    yield chunk
+            return
+        
+        with open_log(filepath) as raw:
+            f = io.TextIOWrapper(raw, encoding='utf-8')
+            while True:
+                block = ''.join(islice(f, chunk_size))
+                if not block:
+                    break
+                
+                chunk = self.parse_block(block)
+                if not chunk.empty:
+                    yield chunk
+    
+    def parse_byte_range(self, filepath: str, start: int, end: int,
+                         chunk_size: int = 10000):
+        """
+        Parse the lines in [start, end) of a plain-text file
+        Both offsets must be line-aligned (see split_byte_ranges)
+        """
+        with open(filepath, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = b''.join(islice(f, chunk_size))
+                if not block:
+                    break
+                
+                # The last block may run past the end of the range
+                block = block[:remaining]
+                remaining -= len(block)
+                
+                text = block.decode('utf-8')
+                if '\r' in text:
+                    # Match the universal newline handling of text mode
+                    text = text.replace('\r\n', '\n').replace('\r', '\n')
+                
+                chunk = self.parse_block(text)
+                if not chunk.empty:
+                    yield chunk
+    
+    def split_byte_ranges(self, filepath: str, num_ranges: int, start: int = 0,
+                          end: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Split [start, end) of a file into at most num_ranges byte ranges
+        aligned to newlines (end defaults to the file size)
+        """
+        if end is None:
+            end = os.path.getsize(filepath)
+        boundaries = [start]
+        
+        with open(filepath, 'rb') as f:
+            for i in range(1, num_ranges):
+                target = start + (end - start) * i // num_ranges
+                if target <= boundaries[-1]:
+                    continue
+                
+                # Move the boundary forward to the start of the next line
+                f.seek(target - 1)
+                f.readline()
+                offset = f.tell()
+                if boundaries[-1] < offset < end:
+                    boundaries.append(offset)
+        
+        boundaries.append(end)
+        return [(lo, hi) for lo, hi in zip(boundaries, boundaries[1:]) if hi > lo]
+    
+    def _parse_file_lines(self, filepath: str, chunk_size: int):
+        """
+        Line-by-line chunk parser (one parse_line call per line)
         """
         chunk = []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
+        with open_log(filepath) as raw:
+            for line in io.TextIOWrapper(raw, encoding='utf-8'):
                 parsed = self.parse_line(line)
                 if parsed:
                     chunk.append(parsed)
                     
                     if len(chunk) >= chunk_size:
-                        yield pd.DataFrame(chunk)
+                        yield self._records_to_frame(chunk)
                         chunk = []
             
             # Yield remaining data
             if chunk:
-                yield pd.DataFrame(chunk)
+                yield self._records_to_frame(chunk)
     
-    def analyze_error_distribution(self, df: pd.DataFrame) -> Dict:
+    def _records_to_frame(self, records: List[Dict]) -> pd.DataFrame:
         """
-        Calculate error statistics from parsed data
+        Build a typed chunk DataFrame from parse_line dicts
         """
-        # Filter error rows
-        error_mask = df['status'].apply(self.is_error)
-        error_df = df[error_mask]
-        
-        # Calculate statistics
-        total_requests = len(df)
-        total_errors = len(error_df)
-        error_rate = (total_errors / total_requests * 100) if total_requests > 0 else 0
-        
-        # Error code frequency
-        error_freq = error_df['status'].value_counts().to_dict()
-        
-        # Top IPs with errors
-        top_error_ips = error_df['ip'].value_counts().head(10).to_dict()
-        
-        return {
-            'total_requests': total_requests,
-            'total_errors': total_errors,
-            'error_rate': error_rate,
-            'error_frequency': error_freq,
-            'top_error_ips': top_error_ips,
-            'error_df': error_df
-        }
\ No newline at end of file
+        return build_chunk({
+            field: np.array([record.get(field) for record in records], dtype=object)
+            for field in self.fields
+        })
+
+
+def status_codes(codes: Iterable[str]) -> np.ndarray:
+    """
+    Status code strings (e.g. ERROR_CODES) as an int16 array for isin
+    """
+    return np.array(sorted(int(code) for code in codes), dtype=np.int16)
+
+
+def build_chunk(data: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Build a typed chunk from object columns of str or bytes values
+    Each column is factorized first, so decoding and conversion run once per
+    distinct value instead of once per row. Fields outside the typed layout
+    are kept as object columns
+    """
+    frame, ip_table = {}, []
+    for field, values in data.items():
+        if field == 'ip':
+            frame[field], ip_table = _ip_column(values)
+        elif field in COLUMN_BUILDERS:
+            frame[field] = COLUMN_BUILDERS[field](values)
+        else:
+            frame[field] = values
+    
+    df = pd.DataFrame(frame)
+    df.attrs['ip_table'] = ip_table
+    return df
+
+
+def ip_counts(counts: Dict[int, int], ip_table: List[str]) -> Dict:
+    """
+    Re-key counts of encoded ip values for merging across chunks
+    IPv4 addresses stay integers; side table values become their string
+    """
+    result = {}
+    for value, count in counts.items():
+        if value < IP_TABLE_SIZE:
+            value = ip_table[value]
+            count += result.get(value, 0)
+        result[value] = count
+    return result
+
+
+def ip_text(key) -> str:
+    """
+    Dotted form of an ip_counts key
+    """
+    return str(ipaddress.IPv4Address(key)) if isinstance(key, int) else key
+
+
+def ip_keys(values: List[str]) -> list:
+    """
+    Inverse of ip_text for a list of strings
+    """
+    numbers = _ipv4_numbers(values)
+    return [int(number) if number >= IP_TABLE_SIZE else value
+            for value, number in zip(values, numbers)]
+
+
+def epoch_seconds(values: List[str]) -> np.ndarray:
+    """
+    Convert TIMESTAMP_FORMAT strings (or bytes) to int64 epoch seconds
+    Canonical 19-character values are decoded with array arithmetic on
+    their byte matrix; anything else goes through pd.to_datetime with the
+    explicit format. Unparseable values become MISSING_TIME
+    """
+    seconds = np.full(len(values), MISSING_TIME, dtype=np.int64)
+    if len(values) == 0:
+        return seconds
+    
+    fixed, chars = _timestamp_matrix(values)
+    digits = chars[:, TIMESTAMP_DIGITS] - np.uint8(ord('0'))  # Wraps below '0'
+    valid = (digits <= 9).all(axis=1) & (chars[:, TIMESTAMP_SEPARATORS] == SEPARATOR_BYTES).all(axis=1)
+    
+    digits = digits.astype(np.int32)
+    pairs = digits[:, 0::2] * 10 + digits[:, 1::2]
+    hour, minute, second = pairs[:, 4:].T
+    valid &= (hour < 24) & (minute < 60) & (second < 60)
+    
+    # Log timestamps are mostly in order, so the calendar arithmetic runs
+    # once per run of equal dates instead of once per value
+    dates = ((pairs[:, 0] * 100 + pairs[:, 1]) * 100 + pairs[:, 2]) * 100 + pairs[:, 3]
+    starts = np.ones(len(dates), dtype=bool)
+    starts[1:] = dates[1:] != dates[:-1]
+    run_days, run_valid = _civil_days(dates[starts])
+    run = np.cumsum(starts) - 1
+    valid &= run_valid[run]
+    
+    clock = hour * 3600 + minute * 60 + second
+    seconds[fixed[valid]] = run_days[run][valid] * 86400 + clock[valid]
+    
+    # Lenient path for the rest (e.g. single-digit fields from the fallback parser)
+    rest = np.flatnonzero(seconds == MISSING_TIME)
+    if len(rest):
+        rest_values = [values[pos] for pos in rest]
+        if isinstance(values[0], bytes):
+            rest_values = [value.decode('utf-8', errors='replace') for value in rest_values]
+        times = pd.to_datetime(pd.Index(rest_values, dtype=object),
+                               format=TIMESTAMP_FORMAT, errors='coerce')
+        valid = np.asarray(times.notna())
+        seconds[rest[valid]] = times[valid].to_numpy().astype('datetime64[s]').astype(np.int64)
+    return seconds
+
+
+def _timestamp_matrix(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of the values (all str or all bytes) that are
+    TIMESTAMP_LENGTH characters long and their characters as a uint8
+    matrix, one row per value
+    Latin-1 keeps one byte per character; other characters become '?'
+    """
+    text = isinstance(values[0], str)
+    separator = '\n' if text else b'\n'
+    
+    def to_bytes(joined):
+        return joined.encode('latin-1', errors='replace') if text else joined
+    
+    width = TIMESTAMP_LENGTH + 1
+    chars = np.frombuffer(to_bytes(separator.join(values) + separator), dtype=np.uint8)
+    if len(chars) == width * len(values):
+        # Every value has the fixed length exactly when all the separators
+        # land in the last column
+        chars = chars.reshape(-1, width)
+        if (chars[:, -1] == ord('\n')).all():
+            return np.arange(len(values)), chars[:, :TIMESTAMP_LENGTH]
+    
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    fixed = np.flatnonzero(lengths == TIMESTAMP_LENGTH)
+    chars = np.frombuffer(to_bytes(separator[:0].join(values[pos] for pos in fixed)), dtype=np.uint8)
+    return fixed, chars.reshape(-1, TIMESTAMP_LENGTH)
+
+
+def _civil_days(dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Days since 1970-01-01 of YYYYMMDD integers in the proleptic Gregorian
+    calendar, and whether each date exists
+    """
+    year, month, day = dates // 10000, dates // 100 % 100, dates % 100
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = DAYS_IN_MONTH[np.clip(month, 0, 12)] + (leap & (month == 2))
+    valid = (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+    
+    # Count years from March so the leap day is the last day of the year
+    year = (year - (month <= 2)).astype(np.int64)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468, valid
+
+
+def _factorize(values: np.ndarray) -> Tuple[np.ndarray, list]:
+    """
+    Codes and distinct str values of a column of str or bytes values
+    Missing values get code -1
+    """
+    codes, uniques = pd.factorize(values)
+    if infer_dtype(uniques, skipna=True) not in ('string', 'empty'):
+        # Decoding can merge values (e.g. a bytes and a str version of the
+        # same field, or two invalid byte sequences), so factorize again
+        decoded = np.array([value.decode('utf-8', errors='replace') if isinstance(value, bytes)
+                            else value for value in uniques], dtype=object)
+        remap, uniques = pd.factorize(decoded)
+        codes = np.where(codes < 0, -1, remap[codes])
+    return codes, list(uniques)
+
+
+def _lookup(codes: np.ndarray, table: list, missing, dtype) -> np.ndarray:
+    """
+    Map factorized codes through a per-distinct-value table
+    """
+    return np.array(table + [missing], dtype=dtype)[codes]
+
+
+def _status_column(values: np.ndarray) -> np.ndarray:
+    """
+    int16 status codes; INVALID_STATUS where no code can be read
+    """
+    codes, uniques = _factorize(values)
+    table = [int(value) if len(value) == 3 and value.isascii() and value.isdigit()
+             else INVALID_STATUS for value in uniques]
+    return _lookup(codes, table, INVALID_STATUS, np.int16)
+
+
+def _method_column(values: np.ndarray) -> pd.Categorical:
+    """
+    Categorical over METHOD_CATEGORIES; other or missing methods count as
+    OTHER_METHOD, so method counts add up to the request count
+    """
+    other = len(HTTP_METHODS)
+    codes, uniques = _factorize(values)
+    table = [HTTP_METHODS.index(value) if value in HTTP_METHODS else other for value in uniques]
+    return pd.Categorical.from_codes(_lookup(codes, table, other, np.int8), categories=METHOD_CATEGORIES)
+
+
+def _timestamp_column(values: np.ndarray) -> np.ndarray:
+    """
+    int64 epoch seconds; MISSING_TIME where the timestamp is unparseable
+    """
+    if infer_dtype(values, skipna=False) in ('string', 'bytes'):
+        # Converting every row is cheaper than hashing them to factorize
+        return epoch_seconds(values.tolist())
+    codes, uniques = _factorize(values)
+    return _lookup(codes, epoch_seconds(uniques).tolist(), MISSING_TIME, np.int64)
+
+
+def _url_column(values: np.ndarray) -> pd.Categorical:
+    """
+    Dictionary-encode urls as a categorical of the distinct values
+    """
+    codes, uniques = _factorize(values)
+    return pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
+
+
+def _ip_column(values: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+    """
+    uint32 IPv4 addresses and the side table for all other values
+    """
+    codes, uniques = _factorize(values)
+    numbers = _ipv4_numbers(uniques)
+    
+    # Values that are not IPv4, or fall in the reserved range, move to the side table
+    other = np.flatnonzero(numbers < IP_TABLE_SIZE)
+    ip_table = [uniques[pos] for pos in other]
+    numbers[other] = np.arange(len(other))
+    
+    missing = 0
+    if (codes < 0).any():
+        missing = len(ip_table)
+        ip_table.append(None)
+    return _lookup(codes, numbers.tolist(), missing, np.uint32), ip_table
+
+
+def _ipv4_numbers(uniques: List[str]) -> np.ndarray:
+    """
+    Dotted-quad strings as integers, -1 where a value is not a valid IPv4
+    address (the same rules as ipaddress.IPv4Address, applied to all
+    values at once on their byte matrix)
+    """
+    numbers = np.full(len(uniques), -1, dtype=np.int64)
+    if not uniques:
+        return numbers
+    try:
+        quads = np.array(uniques, dtype='S')
+    except UnicodeEncodeError:
+        # Non-ASCII values are never valid addresses; check one by one
+        for pos, value in enumerate(uniques):
+            try:
+                numbers[pos] = int(ipaddress.IPv4Address(value))
+            except ValueError:
+                pass
+        return numbers
+    
+    # Walk the columns of the n x width byte matrix, accumulating each
+    # octet for all values at once
+    width = min(quads.dtype.itemsize, 15)
+    chars = quads.view(np.uint8).reshape(len(quads), -1)[:, :width].astype(np.int64)
+    rows = np.arange(len(quads))
+    octets = np.zeros((len(quads), 4), dtype=np.int64)
+    lengths = np.zeros((len(quads), 4), dtype=np.int64)
+    dots = np.zeros(len(quads), dtype=np.int64)
+    valid = np.char.str_len(quads) <= width
+    for column in chars.T:
+        digit = (column >= ord('0')) & (column <= ord('9'))
+        dot = column == ord('.')
+        # Anything else (or a fourth dot) can only be the NUL padding at the end
+        valid &= digit | (dot & (dots < 3)) | (column == 0)
+        octet = np.minimum(dots, 3)
+        current = octets[rows, octet]
+        # A leading zero is only allowed in the octet "0" itself
+        valid &= ~(digit & (lengths[rows, octet] == 1) & (current == 0))
+        octets[rows, octet] = np.where(digit, current * 10 + column - ord('0'), current)
+        lengths[rows, octet] += digit
+        dots += dot
+    valid &= (dots == 3) & ((lengths >= 1) & (lengths <= 3) & (octets <= 255)).all(axis=1)
+    numbers[valid] = octets[valid] @ np.array([1 << 24, 1 << 16, 1 << 8, 1])
+    return numbers
+
+
+COLUMN_BUILDERS = {
+    'status': _status_column,
+    'method': _method_column,
+    'timestamp': _timestamp_column,
+    'url': _url_column,
+}
@@ -0,0 +1,298 @@
+"""
+Metric registry and per-chunk execution planner
+Every metric declares the chunk columns and the shared intermediates it
+needs (error mask, error rows, hour column, ...). A plan computes each
+intermediate at most once per chunk and hands it to every metric that
+uses it, so adding a metric never adds another pass over the chunk
+"""
+from collections import Counter
+from typing import Callable, Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import ERROR_CODES, HLL_PRECISION, HLL_HOURLY_PRECISION
+from log_parser import INVALID_STATUS, IP_TABLE_SIZE, MISSING_TIME, ip_counts, status_codes
+from sketches import HyperLogLog, KeyedHyperLogLog
+
+# name -> Step, in registration order
+INTERMEDIATES = {}
+METRICS = {}
+
+
+class Step:
+    """
+    A registered intermediate or metric
+    func(chunk, inputs) receives the chunk and a dict of the intermediates
+    named in needs; a metric returns the value to fold into its
+    accumulator with accumulator.update (counts for a Counter)
+    """
+
+    def __init__(self, name: str, func: Callable, needs: Tuple[str, ...] = (),
+                 columns: Tuple[str, ...] = (), accumulator: Callable = Counter):
+        self.name = name
+        self.func = func
+        self.needs = needs
+        self.columns = columns
+        self.accumulator = accumulator
+
+
+def intermediate(name: str, needs: Iterable[str] = (), columns: Iterable[str] = ()):
+    """
+    Register a shared per-chunk value
+    """
+    def register(func):
+        INTERMEDIATES[name] = Step(name, func, tuple(needs), tuple(columns))
+        return func
+    return register
+
+
+def metric(name: str, needs: Iterable[str] = (), columns: Iterable[str] = (),
+           accumulator: Callable = Counter):
+    """
+    Register a metric; accumulator creates its empty running value
+    """
+    def register(func):
+        METRICS[name] = Step(name, func, tuple(needs), tuple(columns), accumulator)
+        return func
+    return register
+
+
+class MetricPlan:
+    """
+    Execution plan for a set of metrics: the intermediates they need in
+    dependency order and the chunk columns the whole plan reads
+    """
+
+    def __init__(self, metrics: Iterable[str] = None, error_codes=ERROR_CODES):
+        self.metrics = [METRICS[name] for name in (metrics if metrics is not None else METRICS)]
+        self.error_status = status_codes(error_codes)
+        self.steps = []
+        for step in self.metrics:
+            self._add_needs(step)
+
+        self.columns = []
+        for step in self.steps + self.metrics:
+            for column in step.columns:
+                if column not in self.columns:
+                    self.columns.append(column)
+
+    def _add_needs(self, step: Step):
+        """
+        Append the intermediates a step needs after their own needs
+        """
+        for name in step.needs:
+            needed = INTERMEDIATES[name]
+            if needed not in self.steps:
+                self._add_needs(needed)
+                self.steps.append(needed)
+
+    def run(self, chunk: pd.DataFrame) -> Dict[str, Dict]:
+        """
+        Evaluate every metric of the plan on one chunk
+        Returns metric name -> counts
+        """
+        values = {'error_status': self.error_status}
+        for step in self.steps:
+            values[step.name] = step.func(chunk, values)
+        return {step.name: step.func(chunk, values) for step in self.metrics}
+
+
+def value_counts(values: np.ndarray, key=int) -> Dict:
+    """
+    Counts of the distinct values of a numeric array
+    """
+    values, counts = np.unique(values, return_counts=True)
+    return {key(value): count for value, count in zip(values.tolist(), counts.tolist())}
+
+
+def category_counts(series: pd.Series) -> Dict:
+    """
+    Counts of the categories that occur in a categorical column
+    Counts the integer codes, so unused categories cost nothing
+    """
+    codes = series.cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0])
+    categories = series.cat.categories
+    return {categories[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+
+# Intermediates
+
+@intermediate('ip_table')
+def _ip_table(chunk, inputs):
+    return chunk.attrs.get('ip_table', [])
+
+
+@intermediate('error_mask', columns=('status',))
+def _error_mask(chunk, inputs):
+    return np.isin(chunk['status'].to_numpy(), inputs['error_status'])
+
+
+@intermediate('errors', needs=('error_mask',))
+def _errors(chunk, inputs):
+    return chunk[inputs['error_mask']]
+
+
+@intermediate('error_times', needs=('errors',), columns=('timestamp',))
+def _error_times(chunk, inputs):
+    seconds = inputs['errors']['timestamp'].to_numpy()
+    return seconds[seconds != MISSING_TIME]
+
+
+@intermediate('error_hours', needs=('error_times',))
+def _error_hours(chunk, inputs):
+    return inputs['error_times'] // 3600 % 24
+
+
+@intermediate('request_minutes', columns=('timestamp',))
+def _request_minutes(chunk, inputs):
+    # Minutes since the epoch; rows without a timestamp keep MISSING_TIME
+    seconds = chunk['timestamp'].to_numpy()
+    return np.where(seconds == MISSING_TIME, MISSING_TIME, seconds // 60)
+
+
+@intermediate('request_hours', columns=('timestamp',))
+def _request_hours(chunk, inputs):
+    # Hours since the epoch; rows without a timestamp keep MISSING_TIME
+    seconds = chunk['timestamp'].to_numpy()
+    return np.where(seconds == MISSING_TIME, MISSING_TIME, seconds // 3600)
+
+
+@intermediate('ip_hashes', needs=('ip_table',), columns=('ip',))
+def _ip_hashes(chunk, inputs):
+    # 64-bit hash per row; side-table entries are hashed by their text
+    ips = chunk['ip'].to_numpy()
+    hashes = pd.util.hash_array(ips.astype(np.uint64))
+    table = inputs['ip_table']
+    if len(table):
+        side = ips < IP_TABLE_SIZE
+        hashes[side] = pd.util.hash_array(np.array(table, dtype=object))[ips[side]]
+    return hashes
+
+
+@intermediate('url_hashes', columns=('url',))
+def _url_hashes(chunk, inputs):
+    # Each distinct url is hashed once; code -1 (no url) picks the last entry
+    urls = chunk['url']
+    values = np.append(urls.cat.categories.to_numpy(dtype=object), None)
+    return pd.util.hash_array(values)[urls.cat.codes.to_numpy()]
+
+
+# Metrics
+
+@metric('status_counts', columns=('status',))
+def _status_counts(chunk, inputs):
+    return value_counts(chunk['status'].to_numpy(), key=str)
+
+
+@metric('method_counts', columns=('method',))
+def _method_counts(chunk, inputs):
+    return category_counts(chunk['method'])
+
+
+@metric('request_ip_counts', needs=('ip_table',), columns=('ip',))
+def _request_ip_counts(chunk, inputs):
+    return ip_counts(value_counts(chunk['ip'].to_numpy()), inputs['ip_table'])
+
+
+@metric('error_ip_counts', needs=('errors', 'ip_table'), columns=('ip',))
+def _error_ip_counts(chunk, inputs):
+    return ip_counts(value_counts(inputs['errors']['ip'].to_numpy()), inputs['ip_table'])
+
+
+@metric('error_url_counts', needs=('errors',), columns=('url',))
+def _error_url_counts(chunk, inputs):
+    errors = inputs['errors']
+    return category_counts(errors['url']) if 'url' in errors.columns else {}
+
+
+@metric('hourly_errors', needs=('error_hours',))
+def _hourly_errors(chunk, inputs):
+    hours = np.bincount(inputs['error_hours'], minlength=24)
+    return {int(hour): int(hours[hour]) for hour in np.flatnonzero(hours)}
+
+
+@metric('error_seconds', needs=('error_times',))
+def _error_seconds(chunk, inputs):
+    return value_counts(inputs['error_times'])
+
+
+def minute_counts(minutes: np.ndarray, codes: np.ndarray, width: int, decode: Callable) -> Dict:
+    """
+    Counts of (minute, decode(code)) pairs for codes in [0, width)
+    Each pair is packed into one integer so a single np.unique counts them
+    """
+    valid = (minutes != MISSING_TIME) & (codes >= 0)
+    packed, counts = np.unique(minutes[valid] * width + codes[valid], return_counts=True)
+    minutes, codes = np.divmod(packed, width)
+    return {(minute, decode(code)): count
+            for minute, code, count in zip(minutes.tolist(), codes.tolist(), counts.tolist())}
+
+
+@metric('minute_status_counts', needs=('request_minutes',), columns=('status',))
+def _minute_status_counts(chunk, inputs):
+    # Statuses are below 1000; shifting by INVALID_STATUS makes -1 code 0
+    codes = chunk['status'].to_numpy().astype(np.int64) - INVALID_STATUS
+    return minute_counts(inputs['request_minutes'], codes, 1024, lambda code: str(code + INVALID_STATUS))
+
+
+@metric('minute_method_counts', needs=('request_minutes',), columns=('method',))
+def _minute_method_counts(chunk, inputs):
+    methods = chunk['method']
+    categories = methods.cat.categories
+    codes = methods.cat.codes.to_numpy().astype(np.int64)
+    return minute_counts(inputs['request_minutes'], codes, max(len(categories), 1), lambda code: categories[code])
+
+
+# Distinct counts (HyperLogLog)
+
+def hourly_sketches(hours: np.ndarray, hashes: np.ndarray) -> KeyedHyperLogLog:
+    """
+    One sketch per epoch hour of the rows that have a timestamp
+    """
+    valid = hours != MISSING_TIME
+    return KeyedHyperLogLog.from_hashes(hours[valid], hashes[valid], HLL_HOURLY_PRECISION)
+
+
+def hourly_accumulator() -> KeyedHyperLogLog:
+    return KeyedHyperLogLog(HLL_HOURLY_PRECISION)
+
+
+@metric('unique_clients', needs=('ip_hashes',), accumulator=HyperLogLog)
+def _unique_clients(chunk, inputs):
+    return HyperLogLog.from_hashes(inputs['ip_hashes'], HLL_PRECISION)
+
+
+@metric('unique_error_clients', needs=('ip_hashes', 'error_mask'), accumulator=HyperLogLog)
+def _unique_error_clients(chunk, inputs):
+    return HyperLogLog.from_hashes(inputs['ip_hashes'][inputs['error_mask']], HLL_PRECISION)
+
+
+@metric('unique_urls', needs=('url_hashes',), accumulator=HyperLogLog)
+def _unique_urls(chunk, inputs):
+    return HyperLogLog.from_hashes(inputs['url_hashes'], HLL_PRECISION)
+
+
+@metric('unique_ip_url_pairs', needs=('ip_hashes', 'url_hashes'), accumulator=HyperLogLog)
+def _unique_ip_url_pairs(chunk, inputs):
+    # Rehash the combined hashes so pairs get well-mixed register bits
+    pairs = inputs['ip_hashes'] * np.uint64(0x9E3779B97F4A7C15) + inputs['url_hashes']
+    return HyperLogLog.from_hashes(pd.util.hash_array(pairs), HLL_PRECISION)
+
+
+@metric('hourly_unique_clients', needs=('ip_hashes', 'request_hours'), accumulator=hourly_accumulator)
+def _hourly_unique_clients(chunk, inputs):
+    return hourly_sketches(inputs['request_hours'], inputs['ip_hashes'])
+
+
+@metric('hourly_unique_error_clients', needs=('ip_hashes', 'error_mask', 'request_hours'),
+        accumulator=hourly_accumulator)
+def _hourly_unique_error_clients(chunk, inputs):
+    errors = inputs['error_mask']
+    return hourly_sketches(inputs['request_hours'][errors], inputs['ip_hashes'][errors])
+
+
+@metric('hourly_unique_urls', needs=('url_hashes', 'request_hours'), accumulator=hourly_accumulator)
+def _hourly_unique_urls(chunk, inputs):
+    return hourly_sketches(inputs['request_hours'], inputs['url_hashes'])
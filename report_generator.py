@@ -1,25 +1,76 @@
 """
 Report generation and visualization module
+Charts are rendered headless in a pool of worker processes, one chart per
+task, from the small slice of the results each one plots. A chart whose
+input digest matches the one stored in its PNG is not rendered again
 """
+import matplotlib
+matplotlib.use('Agg')  # Never open a window, even when a display is available
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
+from matplotlib.figure import Figure
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import hashlib
+import json
+import multiprocessing
 import os
 
-from config import OUTPUT_REPORT, CHART_WIDTH, CHART_HEIGHT, COLOR_MAP, TOP_IPS_COUNT
+from config import (OUTPUT_REPORT, CHART_WIDTH, CHART_HEIGHT, CHART_DPI, COLOR_MAP, TOP_IPS_COUNT,
+                    REPORT_WORKERS)
+
+# Chart name -> plotting method; 'dashboard' draws all four on one figure
+CHARTS = {
+    'error_distribution': '_plot_error_distribution',
+    'top_error_ips': '_plot_top_error_ips',
+    'hourly_errors': '_plot_hourly_errors',
+    'method_distribution': '_plot_method_distribution'
+}
+DASHBOARD = 'dashboard'
+DASHBOARD_FILE = "log_analysis_dashboard.png"
+# PNG text chunk holding the digest of the data a chart was rendered from
+DIGEST_KEY = 'Input-Digest'
+
+def render_chart(name: str, data: Dict[str, Any], path: str, digest: str, dpi: int = CHART_DPI) -> str:
+    """
+    Worker process entry point: render one chart from its input data and
+    save it to path, replacing the old file only once the new one is written
+    """
+    generator = ReportGenerator(os.path.dirname(path))
+    
+    if name == DASHBOARD:
+        fig = Figure(figsize=(CHART_WIDTH, CHART_HEIGHT))
+        fig.suptitle('Server Log Analysis Dashboard', fontsize=16, fontweight='bold')
+        for ax, method in zip(fig.subplots(2, 2).flat, CHARTS.values()):
+            getattr(generator, method)(ax, data)
+    else:
+        fig = Figure(figsize=(CHART_WIDTH / 2, CHART_HEIGHT / 2))
+        getattr(generator, CHARTS[name])(fig.subplots(), data)
+    
+    fig.tight_layout()
+    temp_path = f"{path}.tmp"
+    fig.savefig(temp_path, format='png', dpi=dpi, bbox_inches='tight', metadata={DIGEST_KEY: digest})
+    os.replace(temp_path, path)
+    return path
 
 class ReportGenerator:
     """
     Handles report generation and visualization
     """
     
-    def __init__(self):
+    def __init__(self, output_dir: str = "reports", dpi: int = CHART_DPI,
+                 max_workers: int = REPORT_WORKERS):
         # Set style for better visualizations
         plt.style.use('seaborn-v0_8-darkgrid')
         sns.set_palette(COLOR_MAP)
-        self.output_dir = "reports"
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.max_workers = min(max_workers, os.cpu_count() or 1)
+        self.executor = None  # Render pool, started with the first chart to render
+        self.pending = []  # Futures of charts still rendering
+        self.unchanged = []  # Paths of charts skipped since the last wait()
         os.makedirs(self.output_dir, exist_ok=True)
     
     def generate_text_report(self, results: Dict[str, Any], output_file: str = None):
@@ -36,7 +87,8 @@ class ReportGenerator:
             f.write("SERVER LOG ANALYSIS REPORT\n")
             f.write("="*70 + "\n")
             f.write(f"Generated: {timestamp}\n")
-            f.write(f"Log File: server.log\n\n")
+            log_files = results.get('log_files', ['server.log'])
+            f.write(f"Log File: {', '.join(os.path.basename(path) for path in log_files)}\n\n")
             
             # Summary Statistics
             f.write("SUMMARY STATISTICS\n")
@@ -45,6 +97,16 @@ class ReportGenerator:
             f.write(f"Total Errors: {results.get('total_errors', 0):,}\n")
             f.write(f"Error Rate: {results.get('error_rate', 0):.2f}%\n\n")
             
+            # Distinct counts (HyperLogLog estimates)
+            distinct = results.get('detailed_metrics', {}).get('distinct_counts', {})
+            overall = {name: count for name, count in distinct.items() if name != 'hourly'}
+            if overall:
+                f.write("DISTINCT COUNTS (ESTIMATED)\n")
+                f.write("-"*40 + "\n")
+                for name, count in overall.items():
+                    f.write(f"{name.replace('_', ' ').capitalize()}: {count:,}\n")
+                f.write("\n")
+            
             # Error Code Distribution
             f.write("ERROR CODE DISTRIBUTION\n")
             f.write("-"*40 + "\n")
@@ -54,14 +116,36 @@ class ReportGenerator:
                 f.write(f"HTTP {code}: {count:,} occurrences\n")
             f.write("\n")
             
+            # Peak error burst
+            burst = results.get('detailed_metrics', {}).get('peak_error_burst')
+            if burst and burst['errors']:
+                f.write("PEAK ERROR BURST\n")
+                f.write("-"*40 + "\n")
+                f.write(f"{burst['errors']:,} errors within {burst['window_seconds']}s "
+                        f"starting {burst['start']}\n\n")
+            
             # Top IPs with Errors
             f.write(f"TOP {TOP_IPS_COUNT} IP ADDRESSES WITH ERRORS\n")
             f.write("-"*40 + "\n")
             top_ips = results.get('top_error_ips', {})
+            intervals = results.get('detailed_metrics', {}).get('count_intervals')
             for ip, count in list(top_ips.items())[:TOP_IPS_COUNT]:
-                f.write(f"{ip}: {count:,} errors\n")
+                f.write(f"{ip}: {count:,} errors{self._interval(intervals, 'top_error_ips', ip)}\n")
             f.write("\n")
             
+            # Approximate counts come with guaranteed intervals for every entry
+            if intervals:
+                f.write("APPROXIMATE COUNTS\n")
+                f.write("-"*40 + "\n")
+                max_error = intervals['max_error']
+                f.write(f"IP and error path counts may exceed the true count by at most "
+                        f"{max(max_error.values()):,}; true counts lie in the bracketed ranges\n")
+                for ip, count in results['detailed_metrics'].get('top_request_ips', {}).items():
+                    f.write(f"{ip}: {count:,} requests{self._interval(intervals, 'top_request_ips', ip)}\n")
+                for path, count in results['detailed_metrics'].get('error_paths', {}).items():
+                    f.write(f"{path}: {count:,} errors{self._interval(intervals, 'error_paths', path)}\n")
+                f.write("\n")
+            
             # Request Method Distribution
             f.write("REQUEST METHOD DISTRIBUTION\n")
             f.write("-"*40 + "\n")
@@ -70,38 +154,112 @@ class ReportGenerator:
                 percentage = (count / results['total_requests'] * 100) if results['total_requests'] > 0 else 0
                 f.write(f"{method}: {count:,} ({percentage:.1f}%)\n")
             
+            # Per-file breakdown for multi-file analyses
+            per_file = results.get('per_file', {})
+            if per_file:
+                f.write("\nPER-FILE SUMMARY\n")
+                f.write("-"*40 + "\n")
+                for path, file_results in per_file.items():
+                    f.write(f"{os.path.basename(path)}: {file_results['total_requests']:,} requests, "
+                            f"{file_results['total_errors']:,} errors "
+                            f"({file_results['error_rate']:.2f}%)\n")
+            
             f.write("\n" + "="*70 + "\n")
             f.write("END OF REPORT\n")
             f.write("="*70 + "\n")
         
         print(f"Text report saved to: {output_file}")
     
-    def generate_visualizations(self, results: Dict[str, Any]):
+    @staticmethod
+    def _interval(intervals: Dict[str, Any], section: str, key: str) -> str:
+        """Guaranteed [low-high] range for an approximate count, or ''"""
+        if not intervals or key not in intervals.get(section, {}):
+            return ""
+        low, high = intervals[section][key]
+        return f" [{low:,}-{high:,}]"
+    
+    def generate_visualizations(self, results: Dict[str, Any], wait: bool = True) -> List[str]:
         """
-        Generate all visualizations
+        Render every chart whose input changed, in the background
+        With wait=False this returns at once; call wait() before exiting
+        Returns the paths being rendered
         """
-        # Create subplot grid
-        fig, axes = plt.subplots(2, 2, figsize=(CHART_WIDTH, CHART_HEIGHT))
-        fig.suptitle('Server Log Analysis Dashboard', fontsize=16, fontweight='bold')
-        
-        # 1. Error Code Distribution (Pie Chart)
-        self._plot_error_distribution(axes[0, 0], results)
-        
-        # 2. Top IPs with Errors (Bar Chart)
-        self._plot_top_error_ips(axes[0, 1], results)
-        
-        # 3. Hourly Error Pattern (Line Chart)
-        self._plot_hourly_errors(axes[1, 0], results)
-        
-        # 4. Request Method Distribution (Bar Chart)
-        self._plot_method_distribution(axes[1, 1], results)
-        
-        plt.tight_layout()
-        chart_path = os.path.join(self.output_dir, "log_analysis_dashboard.png")
-        plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-        plt.show()
+        rendering = []
+        for name, data in self.chart_inputs(results).items():
+            path = os.path.join(self.output_dir, DASHBOARD_FILE if name == DASHBOARD else f"{name}.png")
+            digest = self.input_digest(name, data)
+            if self._stored_digest(path) == digest:
+                self.unchanged.append(path)
+                continue
+            
+            if self.executor is None:
+                # spawn: workers must not inherit the caller's threads and connections
+                self.executor = ProcessPoolExecutor(self.max_workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+            self.pending.append(self.executor.submit(render_chart, name, data, path, digest, self.dpi))
+            rendering.append(path)
         
-        print(f"Visualizations saved to: {chart_path}")
+        if wait:
+            self.wait()
+        return rendering
+    
+    def wait(self) -> List[str]:
+        """
+        Wait for the charts still rendering; re-raises a failed render
+        Returns the paths written
+        """
+        pending, self.pending = self.pending, []
+        unchanged, self.unchanged = self.unchanged, []
+        written = [future.result() for future in pending]
+        print(f"Visualizations saved to: {self.output_dir} "
+              f"({len(written)} rendered, {len(unchanged)} unchanged)")
+        return written
+    
+    def close(self):
+        """Stop the render pool once pending charts are written"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+    
+    @staticmethod
+    def chart_inputs(results: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """The part of the results each chart plots, keyed by chart name"""
+        detailed = results.get('detailed_metrics', {})
+        top_ips = dict(list(results.get('top_error_ips', {}).items())[:TOP_IPS_COUNT])
+        inputs = {
+            'error_distribution': {'error_frequency': results.get('error_frequency', {})},
+            'top_error_ips': {'top_error_ips': top_ips},
+            'hourly_errors': {'detailed_metrics': {
+                'hourly_error_pattern': detailed.get('hourly_error_pattern', {})}},
+            'method_distribution': {'detailed_metrics': {
+                'method_distribution': detailed.get('method_distribution', {})}}
+        }
+        inputs[DASHBOARD] = {
+            'error_frequency': inputs['error_distribution']['error_frequency'],
+            'top_error_ips': top_ips,
+            'detailed_metrics': {**inputs['hourly_errors']['detailed_metrics'],
+                                 **inputs['method_distribution']['detailed_metrics']}
+        }
+        return inputs
+    
+    def input_digest(self, name: str, data: Dict[str, Any]) -> str:
+        """Digest of a chart's data and render settings"""
+        payload = json.dumps({'chart': name, 'data': data, 'dpi': self.dpi,
+                              'size': [CHART_WIDTH, CHART_HEIGHT], 'colors': COLOR_MAP},
+                             sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+    
+    @staticmethod
+    def _stored_digest(path: str) -> Optional[str]:
+        """Digest saved in an existing chart, or None"""
+        if not os.path.exists(path):
+            return None
+        from PIL import Image
+        try:
+            with Image.open(path) as image:
+                return image.text.get(DIGEST_KEY)
+        except (OSError, SyntaxError):
+            return None
     
     def _plot_error_distribution(self, ax, results: Dict[str, Any]):
         """Plot error code distribution as pie chart"""
@@ -0,0 +1,317 @@
+"""
+Mergeable summaries for approximate counting
+SpaceSaving keeps at most capacity counters, so memory stays bounded however
+many distinct keys are counted. Every reported count overestimates the
+true count by at most its recorded error, and no error exceeds
+total / capacity, whichever way the input was chunked or merged.
+HyperLogLog estimates the number of distinct values from a fixed array of
+registers; merging two sketches is an element-wise maximum
+"""
+import base64
+import math
+import zlib
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from config import HLL_PRECISION
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary with a Counter-like read interface
+    update() folds in exact counts (e.g. one chunk) or another summary
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}  # key -> upper bound of its count
+        self.errors = {}  # key -> overestimate of counts[key], if nonzero
+        self.floor = 0  # Upper bound of the count of any key not kept
+        self.total = 0
+
+    @classmethod
+    def for_error(cls, error: float) -> 'SpaceSaving':
+        """
+        Summary whose counts are off by at most error * total
+        """
+        return cls(math.ceil(1 / error))
+
+    def update(self, other: Union[Dict, 'SpaceSaving']):
+        """
+        Merge exact counts or another summary into this one
+        A key missing from one side may have occurred there up to that
+        side's floor times, so it is charged the floor as both count and
+        error; afterwards only the capacity largest counts are kept
+        """
+        if isinstance(other, SpaceSaving):
+            other_counts, other_errors, other_floor = other.counts, other.errors, other.floor
+            self.total += other.total
+        else:
+            other_counts, other_errors, other_floor = other, {}, 0
+            self.total += sum(other.values())
+        if not other_counts:
+            return
+
+        counts, errors, floor = self.counts, self.errors, self.floor
+        if other_floor:
+            for key in counts:
+                counts[key] += other_floor
+                errors[key] = errors.get(key, 0) + other_floor
+        # Keys of this summary that other lacks are now settled; only the
+        # keys of other need visiting, each exactly once
+        for key, count in other_counts.items():
+            error = other_errors.get(key, 0)
+            if key in counts:
+                counts[key] += count - other_floor
+                error += errors.get(key, 0) - other_floor
+            else:
+                counts[key] = count + floor
+                error += floor
+            if error:
+                errors[key] = error
+            else:
+                errors.pop(key, None)
+
+        self.floor = floor + other_floor
+        if len(counts) > self.capacity:
+            keys = list(counts)
+            values = np.fromiter(counts.values(), dtype=np.int64, count=len(keys))
+            order = np.argpartition(-values, self.capacity)
+            self.floor = max(self.floor, int(values[order[self.capacity]]))
+            counts = {keys[i]: counts[keys[i]] for i in order[:self.capacity].tolist()}
+            errors = {key: errors[key] for key in counts if key in errors}
+        self.counts, self.errors = counts, errors
+
+    def bounds(self, key) -> Tuple[int, int]:
+        """
+        Guaranteed (low, high) interval for the true count of a key
+        """
+        if key not in self.counts:
+            return 0, self.floor
+        count = self.counts[key]
+        return count - self.errors.get(key, 0), count
+
+    @property
+    def max_error(self) -> int:
+        """
+        Largest possible overestimate of any count in the summary
+        """
+        return self.floor
+
+    def items(self) -> Iterable[Tuple]:
+        return self.counts.items()
+
+    def values(self) -> Iterable[int]:
+        return self.counts.values()
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def to_state(self, key: Callable = None) -> Dict:
+        """
+        JSON-serializable snapshot; key maps each counted key to a JSON key
+        """
+        convert = key or (lambda value: value)
+        return {
+            'capacity': self.capacity,
+            'floor': self.floor,
+            'total': self.total,
+            'counts': {convert(k): count for k, count in self.counts.items()},
+            'errors': {convert(k): error for k, error in self.errors.items()}
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict, keys: Callable[[List], List] = None) -> 'SpaceSaving':
+        """
+        Rebuild a summary from to_state output; keys maps the list of
+        stored keys back to counted keys
+        """
+        convert = keys or (lambda values: values)
+        summary = cls(state['capacity'])
+        summary.floor = state['floor']
+        summary.total = state['total']
+        summary.counts = dict(zip(convert(list(state['counts'])), state['counts'].values()))
+        summary.errors = dict(zip(convert(list(state['errors'])), state['errors'].values()))
+        return summary
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over 64-bit hashes
+    2 ** precision one-byte registers; the relative standard error of
+    count() is about 1.04 / sqrt(2 ** precision)
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def from_hashes(cls, hashes: np.ndarray, precision: int = HLL_PRECISION) -> 'HyperLogLog':
+        """
+        Sketch of an array of uint64 hashes
+        """
+        sketch = cls(precision)
+        index, rank = register_ranks(hashes, precision)
+        np.maximum.at(sketch.registers, index, rank)
+        return sketch
+
+    def update(self, other: 'HyperLogLog'):
+        """
+        Merge another sketch of the same precision into this one
+        """
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog precision {other.precision} "
+                             f"into precision {self.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        """
+        Estimated number of distinct hashes added
+        Uses Ertl's improved estimator from the register histogram, which
+        stays unbiased from empty sketches up to very large counts
+        """
+        m = len(self.registers)
+        width = rank_width(self.precision)
+        histogram = np.bincount(self.registers, minlength=width + 2).tolist()
+        z = m * _tau(1 - histogram[width + 1] / m)
+        for rank in range(width, 0, -1):
+            z = 0.5 * (z + histogram[rank])
+        z += m * _sigma(histogram[0] / m)
+        return int(round(m * m / (2 * math.log(2) * z))) if z != math.inf else 0
+
+    def __bool__(self) -> bool:
+        return bool(self.registers.any())
+
+    def to_bytes(self) -> bytes:
+        """
+        Compressed registers; most registers of small sketches are zero
+        """
+        return zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int) -> 'HyperLogLog':
+        sketch = cls(precision)
+        sketch.registers = np.frombuffer(zlib.decompress(data), dtype=np.uint8).copy()
+        return sketch
+
+    def to_state(self, key: Callable = None) -> Dict:
+        """
+        JSON-serializable snapshot
+        """
+        return {'precision': self.precision, 'registers': base64.b64encode(self.to_bytes()).decode('ascii')}
+
+    @classmethod
+    def from_state(cls, state: Dict, keys: Callable[[List], List] = None) -> 'HyperLogLog':
+        return cls.from_bytes(base64.b64decode(state['registers']), state['precision'])
+
+
+class KeyedHyperLogLog(dict):
+    """
+    One HyperLogLog per key (e.g. per hour), merged key by key
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        super().__init__()
+        self.precision = precision
+
+    @classmethod
+    def from_hashes(cls, keys: np.ndarray, hashes: np.ndarray,
+                    precision: int = HLL_PRECISION) -> 'KeyedHyperLogLog':
+        """
+        Sketch each group of hashes that share a key, in one pass
+        """
+        sketches = cls(precision)
+        if len(keys) == 0:
+            return sketches
+        unique_keys, group = np.unique(keys, return_inverse=True)
+        index, rank = register_ranks(hashes, precision)
+        registers = np.zeros((len(unique_keys), 1 << precision), dtype=np.uint8)
+        np.maximum.at(registers, (group, index), rank)
+        for key, row in zip(unique_keys.tolist(), registers):
+            sketch = HyperLogLog(precision)
+            sketch.registers = row
+            sketches[key] = sketch
+        return sketches
+
+    def update(self, other: Dict):
+        for key, sketch in other.items():
+            if key in self:
+                self[key].update(sketch)
+            else:
+                self[key] = HyperLogLog(self.precision)
+                self[key].update(sketch)
+
+    def counts(self) -> Dict:
+        """
+        key -> estimated distinct count, in key order
+        """
+        return {key: self[key].count() for key in sorted(self)}
+
+    def to_state(self, key: Callable = None) -> Dict:
+        convert = key or (lambda value: value)
+        return {
+            'precision': self.precision,
+            'sketches': {convert(k): sketch.to_state() for k, sketch in self.items()}
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict, keys: Callable[[List], List] = None) -> 'KeyedHyperLogLog':
+        convert = keys or (lambda values: values)
+        sketches = cls(state['precision'])
+        stored = state['sketches']
+        for key, sketch in zip(convert(list(stored)), stored.values()):
+            sketches[key] = HyperLogLog.from_state(sketch)
+        return sketches
+
+
+def rank_width(precision: int) -> int:
+    """
+    Hash bits ranked after the register index; capped at 52 so the float
+    conversion used to find the highest set bit is exact
+    """
+    return min(64 - precision, 52)
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+def register_ranks(hashes: np.ndarray, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Register index (top precision bits) and rank (1 + leading zeros of
+    the next rank_width bits) of each hash
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    width = rank_width(precision)
+    rest = (hashes << np.uint64(precision)) >> np.uint64(64 - width)
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    rank = (width + 1 - bit_length).astype(np.uint8)
+    return index, rank
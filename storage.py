@@ -0,0 +1,114 @@
+"""
+SQLite storage layer: tuned engines, bounded pools and a serialized writer
+Every connection gets the SQLITE_PRAGMAS (WAL, synchronous, cache and mmap
+sizes). Writes run one at a time on a single writer thread, so concurrent
+writers never fight over the database lock, while WAL lets any number of
+pooled or read-only connections keep reading
+"""
+import functools
+import queue
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from config import SQLITE_PRAGMAS, DB_POOL_SIZE, DB_POOL_TIMEOUT
+
+# Pragmas that change the database file; a read-only connection cannot set them
+PERSISTENT_PRAGMAS = ('journal_mode',)
+
+
+def read_only_url(database_url: str) -> str:
+    """
+    URL that opens the same SQLite file read-only (mode=ro)
+    """
+    url = make_url(database_url)
+    return url.set(database=f"file:{url.database}", query={'mode': 'ro', 'uri': 'true'}) \
+        .render_as_string(hide_password=False)
+
+
+def create_sqlite_engine(database_url: str, read_only: bool = False, pragmas: dict = None):
+    """
+    Engine with a bounded connection pool that applies the pragmas to
+    every new connection; other databases get a plain pooled engine
+    """
+    is_sqlite = make_url(database_url).get_backend_name() == 'sqlite'
+    if read_only and is_sqlite:
+        database_url = read_only_url(database_url)
+    engine = create_engine(database_url, pool_size=DB_POOL_SIZE, max_overflow=0,
+                           pool_timeout=DB_POOL_TIMEOUT)
+    if not is_sqlite:
+        return engine
+
+    pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+    if read_only:
+        for name in PERSISTENT_PRAGMAS:
+            pragmas.pop(name, None)
+        pragmas['query_only'] = 'ON'
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    return engine
+
+
+class WriterThread:
+    """
+    Runs submitted write functions one at a time on a single daemon
+    thread, started on first use
+    """
+
+    def __init__(self, name: str = 'db-writer'):
+        self.name = name
+        self.queue = queue.Queue()
+        self.thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """
+        Queue func(*args, **kwargs); the Future holds its result
+        """
+        future = Future()
+        with self._lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+        self.queue.put((func, args, kwargs, future))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """
+        Run func on the writer thread and wait for its result
+        Calls made from the writer thread itself run directly
+        """
+        if threading.current_thread() is self.thread:
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def _run(self):
+        while True:
+            func, args, kwargs, future = self.queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+def serialized_write(method):
+    """
+    Decorator for DatabaseManager methods that write: the call runs on
+    the manager's writer thread
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.read_only:
+            raise PermissionError(f"{method.__name__} needs a writable DatabaseManager")
+        return self.writer.run(method, self, *args, **kwargs)
+    return wrapper